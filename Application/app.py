@@ -1,5 +1,8 @@
+import importlib
+import os
+import time
 import streamlit as st
-import home, loan_core_ml, loan_chatbot, about_me
+from import_report import record
 from styles import app_styles
 # Set page config with default collapsed sidebar
 st.set_page_config(
@@ -10,19 +13,39 @@ st.set_page_config(
 )
 app_styles()
 
-# Sidebar Navigation
+# Optional Prometheus endpoint for this Streamlit process, e.g. LOAN_METRICS_PORT=9100
+if os.environ.get("LOAN_METRICS_PORT"):
+    import metrics
+    metrics.start_http_server(int(os.environ["LOAN_METRICS_PORT"]))
+
+# Sidebar label -> page module. A page (and the model, LLM client and
+# libraries behind it) is only imported once it is opened.
+PAGES = {
+    "Home": "home",
+    "Prediction (Traditional)": "loan_core_ml",
+    "Chatbot (GEN-AI)": "loan_chatbot",
+    "About Me": "about_me",
+}
+
+# Sidebar Navigation; ?page=<module> links straight to a page
+requested = st.query_params.get("page")
+modules = list(PAGES.values())
 st.sidebar.title("Navigation 🧭")
 app_mode = st.sidebar.radio(
     "Go to:",
-    ["Home", "Prediction (Traditional)", "Chatbot (GEN-AI)", "About Me"],
+    list(PAGES),
+    index=modules.index(requested) if requested in modules else 0,
 )
 
-# Route to pages based on sidebar selection
-if app_mode == "Home":
-    home.show()
-elif app_mode == "Prediction (Traditional)":
-    loan_core_ml.show()
-elif app_mode == "Chatbot (GEN-AI)":
-    loan_chatbot.show()
-elif app_mode == "About Me":
-    about_me.show()
+# Route to the selected page, importing it on first use
+started = time.perf_counter()
+page = importlib.import_module(PAGES[app_mode])
+imported = time.perf_counter()
+page.show()
+report = record(app_mode, imported - started, time.perf_counter() - imported)
+
+if os.environ.get("LOAN_IMPORT_REPORT"):
+    st.sidebar.caption(
+        f"{'Cold' if report['first_run'] else 'Warm'} run · import {report['import_ms']:.0f} ms · "
+        f"render {report['render_ms']:.0f} ms · loaded: {', '.join(report['heavy_modules']) or 'no heavy libraries'}"
+    )
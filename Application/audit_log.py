@@ -0,0 +1,285 @@
+"""Append-only audit log of every underwriting decision.
+
+A decision is recorded with:
+- the applicant's inputs as received
+- the model version, the probability, the policy, decision and risk grade
+- a timestamp
+- the request ID, plus an applicant ID when the caller sent one
+
+record() only puts the decision on a bounded in-memory queue. A
+background thread writes the queue to SQLite (WAL mode) in one
+transaction per batch, so /predict never waits for the disk. Several
+processes can share one database.
+
+When the writer falls behind and the queue is full, record() waits up to
+LOAN_AUDIT_BLOCK_SECONDS for room. After that it raises AuditBacklog, so
+no decision goes out without an audit record. Memory is bounded by
+LOAN_AUDIT_QUEUE records, however they are split across requests.
+Queued records are written at exit. The writer retries while the
+database is locked or unreachable. Rows SQLite refuses are logged and
+counted as failed.
+
+    python audit_log.py lookup --request-id 3f2a...
+    python audit_log.py lookup --applicant-id A-1042
+    python audit_log.py stats
+"""
+import argparse
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from metrics import AUDIT_QUEUE, AUDIT_RECORDS, on_collect
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.environ.get("LOAN_AUDIT_DB", os.path.join(BASE_DIR, "audit", "decisions.db"))
+QUEUE_SIZE = int(os.environ.get("LOAN_AUDIT_QUEUE", 10_000))
+BLOCK_SECONDS = float(os.environ.get("LOAN_AUDIT_BLOCK_SECONDS", 2))
+BATCH_ROWS = 1000
+
+COLUMNS = ["request_id", "applicant_id", "recorded_at", "source", "model_version", "policy",
+           "probability", "decision", "risk_grade", "inputs"]
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY,
+    request_id TEXT NOT NULL,
+    applicant_id TEXT,
+    recorded_at REAL NOT NULL,
+    source TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    policy TEXT,
+    probability REAL NOT NULL,
+    decision TEXT NOT NULL,
+    risk_grade TEXT,
+    inputs TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS decisions_request_id ON decisions (request_id);
+CREATE INDEX IF NOT EXISTS decisions_applicant_id ON decisions (applicant_id) WHERE applicant_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS decisions_recorded_at ON decisions (recorded_at);
+"""
+INSERT = f"INSERT INTO decisions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBacklog(RuntimeError):
+    """The audit queue stayed full; the decision must not be returned unrecorded."""
+
+
+def new_request_id():
+    return uuid.uuid4().hex
+
+
+def connect(path=DB_PATH):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # WAL with synchronous=NORMAL: a commit survives a process crash, the OS flushes the log
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def entry(request_id, source, model_version, probability, decision, inputs):
+    """One audit record; decision is a risk_policy decide() result."""
+    applicant_id = inputs.get("applicant_id") if isinstance(inputs, dict) else None
+    return (request_id, None if applicant_id is None else str(applicant_id), time.time(), source, model_version,
+            decision.get("policy"), float(probability), decision["decision"], decision.get("risk_grade"), inputs)
+
+
+class AuditLog:
+    def __init__(self, path=DB_PATH, queue_size=QUEUE_SIZE, block_seconds=BLOCK_SECONDS):
+        self.path = path
+        self.queue_size = queue_size
+        self.block_seconds = block_seconds
+        # Unbounded itself: the bound is on records, since one batch request is one item
+        self._queue = queue.Queue()
+        self._records = 0
+        self._room = threading.Condition()
+        self._writer = None
+        self._lock = threading.Lock()
+        self.written = 0
+
+    def record(self, entries):
+        """Queues a list of entry() tuples from one request, written as one unit."""
+        self._ensure_writer()
+        with self._room:
+            # A request larger than the whole bound goes through once the queue is empty
+            if not self._room.wait_for(lambda: self._records == 0 or self._records + len(entries) <= self.queue_size,
+                                       self.block_seconds):
+                AUDIT_RECORDS.inc(len(entries), outcome="rejected")
+                raise AuditBacklog(f"Audit queue full for {self.block_seconds}s")
+            self._records += len(entries)
+        self._queue.put(entries)
+        AUDIT_RECORDS.inc(len(entries), outcome="queued")
+
+    def pending(self):
+        """Records not written yet."""
+        return self._records
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_forever, name="audit-writer", daemon=True)
+                self._writer.start()
+
+    def _write_forever(self):
+        connection = None
+        while True:
+            batch = [self._queue.get()]
+            # Whatever else is waiting goes into the same transaction
+            rows = len(batch[0] or ())
+            while rows < BATCH_ROWS:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+                rows += len(batch[-1] or ())
+            requests = [entries for entries in batch if entries is not None]
+            try:
+                connection = self._write(connection, requests)
+            except Exception:
+                # The writer must outlive any failure, or flush() and every later record() would wait on it
+                logger.exception("Audit writer failed on %d records", rows)
+            finally:
+                with self._room:
+                    self._records -= rows
+                    self._room.notify_all()
+                for _ in batch:
+                    self._queue.task_done()
+            if None in batch:
+                if connection is not None:
+                    connection.close()
+                return
+
+    def _write(self, connection, batch):
+        rows = [(*e[:-1], json.dumps(e[-1], separators=(",", ":"), default=str)) for entries in batch for e in entries]
+        if not rows:
+            return connection
+        while True:
+            try:
+                if connection is None:
+                    connection = connect(self.path)
+                with connection:
+                    connection.executemany(INSERT, rows)
+                break
+            except (sqlite3.OperationalError, OSError):
+                # Locked past the busy timeout, disk full or not reachable: keep the rows and retry;
+                # meanwhile the queue fills and record() pushes back
+                logger.exception("Audit write failed, retrying")
+                if connection is not None:
+                    connection.close()
+                    connection = None
+                time.sleep(1)
+            except sqlite3.Error:
+                # A row SQLite refuses will never go in: write the rest one by one, log the refused
+                refused = []
+                for row in rows:
+                    try:
+                        with connection:
+                            connection.execute(INSERT, row)
+                    except sqlite3.Error:
+                        refused.append(row)
+                logger.exception("Audit records refused: %s", json.dumps(refused, default=str))
+                AUDIT_RECORDS.inc(len(refused), outcome="failed")
+                rows = [row for row in rows if row not in refused]
+                break
+        self.written += len(rows)
+        AUDIT_RECORDS.inc(len(rows), outcome="written")
+        return connection
+
+    def flush(self, timeout=30):
+        """Waits until everything queued so far is on disk; False if that took longer than timeout."""
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=10):
+        with self._lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._queue.put(None)
+            writer.join(timeout)
+            if writer.is_alive():
+                logger.error("Audit writer stuck, %d records not written", self._records)
+
+    def _reset_after_fork(self):
+        # The parent's writer thread and queued records do not exist in the child
+        self._queue = queue.Queue()
+        self._records = 0
+        self._room = threading.Condition()
+        self._writer = None
+        self._lock = threading.Lock()
+
+
+audit = AuditLog()
+atexit.register(audit.close)
+os.register_at_fork(after_in_child=audit._reset_after_fork)
+
+
+def refresh_queue_gauge():
+    AUDIT_QUEUE.set(audit.pending())
+
+
+on_collect(refresh_queue_gauge)
+
+
+def record(request_id, source, model_version, probability, decision, inputs):
+    audit.record([entry(request_id, source, model_version, probability, decision, inputs)])
+
+
+def lookup(request_id=None, applicant_id=None, limit=100, path=DB_PATH):
+    """Audit records for a request or an applicant, newest first."""
+    if not os.path.exists(path):
+        return []
+    where, value = ("request_id", request_id) if request_id is not None else ("applicant_id", applicant_id)
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+    connection.row_factory = sqlite3.Row
+    try:
+        rows = connection.execute(f"SELECT * FROM decisions WHERE {where} = ? ORDER BY id DESC LIMIT ?",
+                                  (value, limit)).fetchall()
+    finally:
+        connection.close()
+    return [dict(row, inputs=json.loads(row["inputs"])) for row in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+    find = commands.add_parser("lookup", help="records for a request or an applicant")
+    key = find.add_mutually_exclusive_group(required=True)
+    key.add_argument("--request-id")
+    key.add_argument("--applicant-id")
+    find.add_argument("--limit", type=int, default=100)
+    commands.add_parser("stats", help="record counts by source and decision")
+    args = parser.parse_args(argv)
+
+    if args.command == "lookup":
+        for row in lookup(args.request_id, args.applicant_id, args.limit, args.db):
+            print(json.dumps(row))
+        return
+
+    connection = connect(args.db)
+    total, first, last = connection.execute(
+        "SELECT COUNT(*), MIN(recorded_at), MAX(recorded_at) FROM decisions").fetchone()
+    print(f"{total:,} decisions" + (f" from {time.ctime(first)} to {time.ctime(last)}" if total else ""))
+    for source, decision, count in connection.execute(
+            "SELECT source, decision, COUNT(*) FROM decisions GROUP BY source, decision ORDER BY source, decision"):
+        print(f"{source:>16} {decision:>14} {count:>10,}")
+
+
+if __name__ == "__main__":
+    main()
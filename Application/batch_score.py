@@ -0,0 +1,287 @@
+"""Score a CSV or Parquet file of applicants in fixed-size chunks.
+
+Chunks flow through a generator pipeline (read -> score -> write), so memory
+stays bounded by the chunk size whatever the input size. A checkpoint next
+to the output records every completed chunk; `--resume` picks up after the
+last one.
+
+    python batch_score.py portfolio.csv scores.csv --chunk-size 100000 --id-column loan_id
+    python batch_score.py portfolio.parquet scores_parquet/ --resume
+
+CSV output is a single file. Parquet output is a directory with one part
+file per chunk. Parquet support needs pyarrow.
+
+Rows are checked like /predict/batch checks them. A row that fails is
+not scored: it is written in its place with empty results and its
+problems in the "errors" column.
+
+With `--typed-cache` a CSV input is read through its typed columnar copy
+(see dataset.py), converted once and memory-mapped on every later run.
+Values the conversion stored as missing are rejected with the same
+problems as on the CSV path.
+
+With `--workers N` chunks are scored in a pool of N processes and written
+back in input order. Workers start from a forkserver (spawn where there is
+none), never from this process: it runs the model registry's watcher thread
+and LightGBM's OpenMP pool, neither of which survives a fork. Each worker
+loads the model once and checks it is the version the run was started with.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from loan_schema import FIELD_ORDER, NUMERIC_FIELDS, validate_frame
+from model_registry import current
+from risk_policy import current_policy
+
+
+def _is_parquet(path):
+    return path.endswith((".parquet", ".pq")) or os.path.isdir(path)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("Parquet input/output needs pyarrow: pip install pyarrow")
+    return pq
+
+
+def read_chunks(path, chunk_size, skip_rows=0, columns=None, typed=False):
+    # Yields DataFrames of at most chunk_size rows, starting after skip_rows
+    if typed and not _is_parquet(path):
+        _require_pyarrow()
+        from dataset import cached, iter_batches, widen
+        try:
+            cached(path)
+        except ValueError as e:
+            # Valid values the schema's dtypes cannot hold: score from the CSV rather than not at all
+            print(f"Typed cache unavailable ({e}), reading the CSV", file=sys.stderr)
+        else:
+            for chunk in iter_batches(path, chunk_size, skip_rows, columns):
+                yield widen(chunk)
+            return
+
+    if _is_parquet(path):
+        pq = _require_pyarrow()
+        skipped = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            if skipped < skip_rows:
+                skipped += batch.num_rows
+                continue
+            yield batch.to_pandas()
+        return
+
+    skip = range(1, skip_rows + 1) if skip_rows else None
+    yield from pd.read_csv(path, chunksize=chunk_size, skiprows=skip, usecols=columns)
+
+
+def score_frame(model, chunk, keep_columns=()):
+    features = chunk[FIELD_ORDER].reset_index(drop=True)
+    for field in NUMERIC_FIELDS:
+        numbers = pd.to_numeric(features[field], errors="coerce")
+        # Text that is not a number is reported like infinity: "must be a number", not imputed
+        features[field] = numbers.mask(numbers.isna() & features[field].notna(), np.inf)
+    errors = validate_frame(features)
+    # Typed-cache values outside the schema arrive missing, with their problem alongside
+    for position, problems in chunk.attrs.get("schema_errors", {}).items():
+        required = {f"{column} is required" for column in problems}
+        errors[position] = [*problems.values(), *(e for e in errors.get(position, ()) if e not in required)]
+    valid = np.ones(len(features), dtype=bool)
+    valid[list(errors)] = False
+
+    scored = chunk[list(keep_columns)].reset_index(drop=True)
+    scored["prediction"] = pd.Series(pd.NA, index=scored.index, dtype="Int64")
+    scored["probability"] = np.nan
+    scored["decision"] = scored["risk_grade"] = ""
+    if valid.any():
+        probabilities = model.predict_proba(features[valid])
+        classes = model.classes_
+        positives = probabilities[:, list(classes).index(1)]
+        scored.loc[valid, "prediction"] = classes[probabilities.argmax(axis=1)]
+        scored.loc[valid, "probability"] = positives
+        decisions, grades = current_policy().decide_many(positives, features.loc[valid, "loan_intent"])
+        scored.loc[valid, "decision"], scored.loc[valid, "risk_grade"] = decisions, grades
+    scored["errors"] = ["; ".join(errors.get(position, ())) for position in range(len(scored))]
+    return scored
+
+
+def score_chunks(chunks, model, keep_columns=()):
+    for chunk in chunks:
+        yield score_frame(model, chunk, keep_columns)
+
+
+# Loaded once per worker process by _init_worker
+_worker_model = None
+
+
+def _init_worker(version):
+    global _worker_model
+    loaded = current()
+    if loaded.version != version:
+        raise RuntimeError(f"Worker loaded model {loaded.version}, expected {version}")
+    _worker_model = loaded.model
+    # One thread per worker; the pool is the parallelism
+    estimator = _worker_model.steps[-1][1] if hasattr(_worker_model, "steps") else _worker_model
+    if "n_jobs" in estimator.get_params():
+        estimator.set_params(n_jobs=1)
+
+
+def _score_in_worker(chunk, keep_columns):
+    return score_frame(_worker_model, chunk, keep_columns)
+
+
+def score_chunks_parallel(chunks, version, keep_columns=(), workers=2):
+    """Like `score_chunks`, with chunks scored across a process pool.
+
+    Every worker loads model `version` from the registry. Results come back
+    in input order. At most 2 * workers chunks are in flight, so memory is
+    bounded by chunk_size * 2 * workers rows.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    if context.get_start_method() == "forkserver":
+        # Imported once in the forkserver, which runs no threads, instead of in every worker
+        context.set_forkserver_preload(["batch_score", "fast_imputer", "lightgbm"])
+
+    pending = deque()
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(version,)) as pool:
+        for chunk in chunks:
+            pending.append(pool.submit(_score_in_worker, chunk, tuple(keep_columns)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class Checkpoint:
+    def __init__(self, output):
+        self.path = output.rstrip("/") + ".checkpoint.json"
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, state):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+
+class CsvWriter:
+    def __init__(self, path, offset):
+        # Anything past the last checkpointed offset is a partial chunk
+        mode = "r+b" if offset else "wb"
+        self.file = open(path, mode)
+        self.file.truncate(offset)
+        self.file.seek(offset)
+
+    def write(self, frame, index):
+        frame.to_csv(self.file, header=self.file.tell() == 0, index=False)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path, offset):
+        self.pq = _require_pyarrow()
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, frame, index):
+        import pyarrow as pa
+        part = os.path.join(self.path, f"part-{index:05d}.parquet")
+        self.pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), part + ".tmp")
+        os.replace(part + ".tmp", part)
+        return 0
+
+    def close(self):
+        pass
+
+
+def run(input_path, output_path, chunk_size=100_000, keep_columns=(), resume=False, workers=1,
+        typed=False, log=sys.stderr):
+    loaded = current()
+    checkpoint = Checkpoint(output_path)
+    state = checkpoint.load() if resume else None
+    if state is not None:
+        if state["input"] != os.path.abspath(input_path) or state["chunk_size"] != chunk_size:
+            raise ValueError("Checkpoint was written for a different input or chunk size")
+        if state["model_version"] != loaded.version:
+            raise ValueError(f"Checkpoint was scored with model {state['model_version']}, "
+                             f"current model is {loaded.version}")
+    else:
+        state = {"input": os.path.abspath(input_path), "chunk_size": chunk_size,
+                 "model_version": loaded.version, "chunks": 0, "rows": 0, "rejected": 0, "offset": 0}
+
+    writer_cls = ParquetWriter if _is_parquet(output_path) else CsvWriter
+    writer = writer_cls(output_path, state["offset"])
+    columns = list(dict.fromkeys([*FIELD_ORDER, *keep_columns]))
+    chunks = read_chunks(input_path, chunk_size, state["rows"], columns, typed)
+
+    if workers > 1:
+        results = score_chunks_parallel(chunks, loaded.version, keep_columns, workers)
+    else:
+        results = score_chunks(chunks, loaded.model, keep_columns)
+
+    start = time.perf_counter()
+    rows = 0
+    try:
+        for scored in results:
+            state["offset"] = writer.write(scored, state["chunks"])
+            state["chunks"] += 1
+            state["rows"] += len(scored)
+            state["rejected"] = state.get("rejected", 0) + int((scored["errors"] != "").sum())
+            checkpoint.save(state)
+
+            rows += len(scored)
+            elapsed = time.perf_counter() - start
+            print(f"chunk {state['chunks']}: {state['rows']:,} rows scored, {state['rejected']:,} rejected, "
+                  f"{rows / elapsed:,.0f} rows/s", file=log)
+    finally:
+        results.close()
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"done: {rows:,} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/s), "
+          f"model {loaded.version}", file=log)
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV or Parquet file of applicants")
+    parser.add_argument("output", help="CSV file, or Parquet directory (.parquet)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="rows per chunk")
+    parser.add_argument("--id-column", action="append", default=[], dest="keep_columns",
+                        help="input column copied to the output, repeatable")
+    parser.add_argument("--resume", action="store_true", help="continue after the last completed chunk")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="scoring processes (0 = one per core); chunks are the unit of work")
+    parser.add_argument("--typed-cache", action="store_true",
+                        help="read a CSV input through its typed columnar cache (needs pyarrow)")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count()
+    run(args.input, args.output, args.chunk_size, args.keep_columns, args.resume, workers, args.typed_cache)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
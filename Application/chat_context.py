@@ -0,0 +1,112 @@
+"""Keeps the chatbot prompt bounded as a conversation grows.
+
+Instead of resending every message, `compact_messages` sends the system
+prompt, a short state summary (the structured `collected_data` plus a
+one-line digest of older question/answer pairs) and as many recent
+messages as fit the token budget. The summary calls the details
+confirmed only once the user confirmed them (intake step "done").
+"""
+import re
+
+from intake import COLLECTING, DONE, pending_field, question as field_question
+from loan_schema import FIELD_LABELS
+
+TOKEN_BUDGET = 1500
+MAX_RECENT_MESSAGES = 8
+SNIPPET_CHARS = 80
+# One intake is ten answers plus a confirmation
+MAX_DIGEST_ANSWERS = 11
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    # Words and punctuation marks, close enough to BPE counts for budgeting
+    return len(_TOKEN_RE.findall(text or ""))
+
+
+def message_tokens(message):
+    # A few tokens of per-message framing on top of the content
+    return estimate_tokens(message["content"]) + 4
+
+
+def _snippet(text):
+    text = " ".join((text or "").split())
+    return text if len(text) <= SNIPPET_CHARS else text[:SNIPPET_CHARS - 3] + "..."
+
+
+def _last_question(text):
+    sentences = re.split(r"(?<=[.?!])\s+", " ".join((text or "").split()))
+    questions = [s for s in sentences if s.endswith("?")]
+    return questions[-1] if questions else sentences[-1]
+
+
+def summarize_state(collected_data, dropped=(), step=None):
+    lines = []
+    if collected_data:
+        missing = [label for k, label in FIELD_LABELS.items() if k not in collected_data]
+        if step == DONE:
+            lines.append("Applicant details confirmed by the user:")
+        elif missing:
+            lines.append("Applicant details collected so far (not confirmed yet):")
+        else:
+            lines.append("Applicant details collected, waiting for the user to confirm them (not confirmed yet):")
+        lines += [f"- {FIELD_LABELS.get(k, k)}: {v}" for k, v in collected_data.items()]
+        if missing:
+            lines.append("Still needed: " + ", ".join(missing))
+            if step == COLLECTING:
+                # The next plain answer is read as this field, so the LLM should not move on
+                lines.append("Pending question: " + field_question(pending_field(collected_data)))
+
+    # Older turns survive only as the latest question -> answer pairs
+    digest = []
+    question = None
+    for message in dropped:
+        if message["role"] == "assistant":
+            question = _last_question(message["content"])
+        elif message["role"] == "user":
+            digest.append(f"- {_snippet(question) if question else 'User'} -> {_snippet(message['content'])}")
+            question = None
+    if digest:
+        lines.append("Earlier answers in this conversation:")
+        lines += digest[-MAX_DIGEST_ANSWERS:]
+
+    if not lines:
+        return None
+    return {"role": "system", "content": "\n".join(lines)}
+
+
+def compact_messages(messages, collected_data=None, budget=TOKEN_BUDGET,
+                     max_recent=MAX_RECENT_MESSAGES, step=None):
+    """The messages to send; `step` is the intake step, which decides how the details are labelled."""
+    system = [m for m in messages if m["role"] == "system"][:1]
+    history = [m for m in messages if m["role"] != "system"]
+
+    # Walk back from the newest message, always keeping the latest one
+    used = sum(message_tokens(m) for m in system)
+    keep_from = len(history)
+    for i in range(len(history) - 1, -1, -1):
+        cost = message_tokens(history[i])
+        within = used + cost <= budget and len(history) - i <= max_recent
+        if keep_from < len(history) and not within:
+            break
+        used += cost
+        keep_from = i
+
+    summary = summarize_state(collected_data, history[:keep_from], step)
+    # The summary has to fit too; give up the oldest recent messages for it
+    if summary is not None:
+        used += message_tokens(summary)
+        while used > budget and keep_from < len(history) - 1:
+            used -= message_tokens(history[keep_from])
+            keep_from += 1
+            summary = summarize_state(collected_data, history[:keep_from], step)
+            used = (sum(message_tokens(m) for m in system + history[keep_from:])
+                    + message_tokens(summary))
+
+    compact = system + ([summary] if summary else []) + history[keep_from:]
+    return [{"role": m["role"], "content": m["content"]} for m in compact]
+
+
+def prompt_tokens(messages):
+    return sum(message_tokens(m) for m in messages)
@@ -49,7 +49,7 @@ def get_initial_messages():
 
 7. AFTER PREDICTION:
    - Present the result clearly and professionally
-   - Provide context for the prediction
+   - Provide context for the prediction using only the Key Factors listed in the result (the model's own feature contributions); do not invent other reasons
    - Offer relevant feedback based on the risk assessment
    - Ask if the user would like to start a new assessment
 
@@ -0,0 +1,306 @@
+"""Typed, columnar cache of the credit risk dataset and larger extracts.
+
+read_csv infers object dtype for the four categoricals and 64-bit numbers
+for everything else. SCHEMA declares every column once:
+- categoricals use the loan_schema enums as categories
+- counts and amounts use the smallest integer type that fits
+- floats use float32, but only where they round-trip exactly at their
+  declared decimals
+
+A CSV is converted chunk by chunk to an uncompressed Arrow IPC (Feather v2)
+file under .data_cache/, named after the source's sha256. The file is
+rebuilt only when that hash changes. Loading memory-maps it, so columns
+without missing values are not copied. Columns outside the schema (IDs
+and the like) are kept as text.
+
+Values are never silently upcast. A value the API would also reject (an
+unknown category, text in a numeric column, an out-of-range number that
+the dtype cannot hold) is stored as missing, and its problem is kept
+next to the cache. load() refuses such a file; iter_batches() hands the
+problems to each batch in frame.attrs["schema_errors"], so batch scoring
+rejects those rows one by one. A valid value that the dtype cannot hold
+is an error: widen the dtype in SCHEMA.
+
+widen() turns the float32 columns back into float64. The result equals
+what read_csv parses, so models see the same numbers either way. Without
+pyarrow, load() parses the CSV with the same dtypes on every call.
+
+    python dataset.py                  # build the cache and compare it with read_csv
+    python dataset.py extract.csv
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from loan_schema import FIELDS, field_error
+from model_registry import DATASET_PATH, file_sha256
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("LOAN_DATA_CACHE", os.path.join(BASE_DIR, ".data_cache"))
+CHUNK_ROWS = 1_000_000
+
+SCHEMA = {
+    "person_age": "int16",
+    "person_income": "int32",
+    "person_home_ownership": "category",
+    "person_emp_length": "float32",
+    "loan_intent": "category",
+    "loan_grade": "category",
+    "loan_amnt": "int32",
+    "loan_int_rate": "float32",
+    "loan_status": "int8",
+    "loan_percent_income": "float32",
+    "cb_person_default_on_file": "category",
+    "cb_person_cred_hist_length": "int16",
+}
+DECIMALS = {"person_emp_length": 0, "loan_int_rate": 2, "loan_percent_income": 2}
+CATEGORIES = {column: sorted(FIELDS[column]["enum"]) for column, dtype in SCHEMA.items() if dtype == "category"}
+SCHEMA_VERSION = hashlib.sha256(json.dumps([SCHEMA, DECIMALS, CATEGORIES]).encode()).hexdigest()[:8]
+
+
+def _text_columns(header):
+    return {column: str for column in header if SCHEMA.get(column, "category") == "category"}
+
+
+def _reject(column, values, numbers, bad, errors, message):
+    # Invalid cells go into errors, or raise when there is no errors dict or the value is valid
+    if errors is None:
+        raise ValueError(message)
+    for position in np.flatnonzero(bad.to_numpy()):
+        value = values.iloc[position] if numbers is None or pd.isna(numbers.iloc[position]) else numbers.iloc[position]
+        problem = field_error(column, value.item() if isinstance(value, np.generic) else value)
+        if problem is None:
+            raise ValueError(message)
+        errors.setdefault(int(position), {})[column] = problem
+
+
+def convert(frame, errors=None):
+    """frame with the SCHEMA dtypes; raises ValueError for values they cannot hold.
+
+    With an errors dict, values the API would reject too are set missing
+    instead and recorded as {row position: {column: problem}}.
+    """
+    frame = frame.copy()
+    for column in frame:
+        dtype = SCHEMA.get(column)
+        values = frame[column]
+        if dtype is None:
+            continue
+        if dtype == "category":
+            bad = values.notna() & ~values.isin(CATEGORIES[column])
+            if bad.any():
+                unknown = sorted(set(values[bad]))[:5]
+                _reject(column, values, None, bad, errors, f"{column} has values outside the schema: {unknown}")
+            frame[column] = values.mask(bad).astype(pd.CategoricalDtype(CATEGORIES[column]))
+            continue
+
+        numbers = pd.to_numeric(values, errors="raise" if errors is None else "coerce").astype("float64")
+        if dtype.startswith("int"):
+            limits = np.iinfo(dtype)
+            # Missing or not a number (text) included: integer columns have no missing values
+            bad = numbers.isna() | (numbers % 1 != 0) | (numbers < limits.min) | (numbers > limits.max)
+            if bad.any():
+                _reject(column, values, numbers, bad, errors, f"{column} does not fit {dtype}; widen it in dataset.SCHEMA")
+            numbers = numbers.mask(bad)
+            # Missing values need the nullable dtype; Arrow stores both as the same integer type
+            frame[column] = numbers.astype(dtype if numbers.notna().all() else dtype.capitalize())
+        else:
+            narrowed = numbers.astype(dtype)
+            text = numbers.isna() & values.notna()
+            bad = text | (narrowed.astype("float64").round(DECIMALS[column]) != numbers) & numbers.notna()
+            if bad.any():
+                _reject(column, values, numbers, bad, errors,
+                        f"{column} has more than {DECIMALS[column]} decimals; widen it in dataset.SCHEMA")
+            frame[column] = narrowed.mask(bad)
+    return frame
+
+
+def widen(frame):
+    """The float32 columns as float64, equal to what read_csv parses."""
+    frame = frame.copy()
+    for column, decimals in DECIMALS.items():
+        if column in frame and frame[column].dtype == "float32":
+            frame[column] = frame[column].astype("float64").round(decimals)
+    return frame
+
+
+def _read_sidecar(path, cache_dir):
+    name = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    sidecar = os.path.join(cache_dir, f"{name}.json")
+    try:
+        with open(sidecar) as f:
+            return sidecar, json.load(f)
+    except (OSError, ValueError):
+        return sidecar, {}
+
+
+def source_sha256(path=DATASET_PATH, cache_dir=CACHE_DIR):
+    """sha256 of the source file, rehashed only when its size or mtime changed."""
+    stat = os.stat(path)
+    _, source = _read_sidecar(path, cache_dir)
+    if (source.get("size"), source.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+        return source["sha256"]
+    return file_sha256(path)
+
+
+def _errors_path(target):
+    return f"{target}.errors.json"
+
+
+def _read_errors(target):
+    # {row: {column: problem}} for the values stored as missing; none for caches without the file
+    try:
+        with open(_errors_path(target)) as f:
+            return {int(row): problems for row, problems in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+
+
+def _write(path, target):
+    import pyarrow as pa
+
+    text = _text_columns(pd.read_csv(path, nrows=0).columns)
+    tmp_path = f"{target}.tmp{os.getpid()}"
+    writer = None
+    errors, rows = {}, 0
+    try:
+        for chunk in pd.read_csv(path, dtype=text, chunksize=CHUNK_ROWS):
+            chunk_errors = {}
+            table = pa.Table.from_pandas(convert(chunk, chunk_errors), preserve_index=False)
+            errors.update({rows + position: problems for position, problems in chunk_errors.items()})
+            rows += len(chunk)
+            if writer is None:
+                schema = table.schema
+                writer = pa.ipc.new_file(tmp_path, schema)
+            # A chunk with missing integers has nullable dtypes in its pandas metadata; the types are the same
+            writer.write_table(table.replace_schema_metadata(schema.metadata).combine_chunks())
+        if writer is None:
+            empty = pa.Table.from_pandas(convert(pd.read_csv(path, dtype=text, nrows=0)), preserve_index=False)
+            writer = pa.ipc.new_file(tmp_path, empty.schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    with open(f"{_errors_path(target)}.tmp{os.getpid()}", "w") as f:
+        json.dump(errors, f)
+    os.replace(f.name, _errors_path(target))
+    os.replace(tmp_path, target)
+
+
+def cached(path=DATASET_PATH, cache_dir=CACHE_DIR, log=None):
+    """Path of the typed Arrow copy of path, built if missing or stale; None without pyarrow."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+
+    os.makedirs(cache_dir, exist_ok=True)
+    stat = os.stat(path)
+    sha256 = source_sha256(path, cache_dir)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    target = os.path.join(cache_dir, f"{stem}-{sha256[:16]}-{SCHEMA_VERSION}.arrow")
+    if not os.path.exists(target):
+        start = time.perf_counter()
+        _write(path, target)
+        if log:
+            log(f"converted {path} to {target} in {time.perf_counter() - start:.1f}s")
+
+    sidecar, previous = _read_sidecar(path, cache_dir)
+    source = {"source": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+              "sha256": sha256, "file": target}
+    if source != previous:
+        # The source changed (or was touched): drop its stale copy
+        if previous.get("file") not in (None, target):
+            for stale in (previous["file"], _errors_path(previous["file"])):
+                if os.path.exists(stale):
+                    os.remove(stale)
+        with open(sidecar, "w") as f:
+            json.dump(source, f)
+    return target
+
+
+def schema_errors(path=DATASET_PATH, cache_dir=CACHE_DIR):
+    """{row: {column: problem}} for the values of path stored as missing."""
+    return _read_errors(cached(path, cache_dir))
+
+
+def load(path=DATASET_PATH, columns=None, cache_dir=CACHE_DIR):
+    """The CSV at path as a typed DataFrame, read from its memory-mapped cache.
+
+    Raises ValueError when a value is outside the schema.
+    """
+    target = cached(path, cache_dir)
+    if target is None:
+        text = _text_columns(pd.read_csv(path, nrows=0).columns)
+        return convert(pd.read_csv(path, dtype=text, usecols=columns))
+
+    errors = _read_errors(target)
+    if errors:
+        row = min(errors)
+        raise ValueError(f"{path}: {len(errors):,} rows outside the schema, the first is row {row}: "
+                         + "; ".join(errors[row].values()))
+    from pyarrow import feather
+    table = feather.read_table(target, columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True)
+
+
+def iter_batches(path, batch_size, skip_rows=0, columns=None, cache_dir=CACHE_DIR):
+    """Typed DataFrames of at most batch_size rows from the cached copy of path, after skip_rows.
+
+    Values outside the schema are missing; attrs["schema_errors"] holds
+    their problems as {row position in the frame: {column: problem}}.
+    """
+    import pyarrow as pa
+
+    target = cached(path, cache_dir)
+    errors = _read_errors(target)
+    error_rows = sorted(errors)
+    reader = pa.ipc.open_file(pa.memory_map(target))
+    first_row = 0
+    for index in range(reader.num_record_batches):
+        batch = reader.get_batch(index)
+        if skip_rows >= batch.num_rows:
+            skip_rows -= batch.num_rows
+            first_row += batch.num_rows
+            continue
+        if columns is not None:
+            batch = batch.select(columns)
+        for start in range(skip_rows, batch.num_rows, batch_size):
+            frame = batch.slice(start, batch_size).to_pandas(split_blocks=True)
+            low = first_row + start
+            rows = error_rows[bisect.bisect_left(error_rows, low):bisect.bisect_left(error_rows, low + len(frame))]
+            frame.attrs["schema_errors"] = {row - low: errors[row] for row in rows}
+            yield frame
+        first_row += batch.num_rows
+        skip_rows = 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("csv", nargs="?", default=DATASET_PATH)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    target = cached(args.csv, args.cache_dir, log=print)
+    if target is None:
+        raise SystemExit("The columnar cache needs pyarrow: pip install pyarrow")
+
+    start = time.perf_counter()
+    plain = pd.read_csv(args.csv)
+    csv_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    typed = load(args.csv, cache_dir=args.cache_dir)
+    cache_seconds = time.perf_counter() - start
+
+    print(f"{target}: {os.path.getsize(target) / 1e6:.1f} MB on disk, {len(typed):,} rows")
+    print(f"read_csv:     {csv_seconds * 1000:8.1f} ms  {plain.memory_usage(deep=True).sum() / 1e6:8.1f} MB")
+    print(f"typed cache:  {cache_seconds * 1000:8.1f} ms  {typed.memory_usage(deep=True).sum() / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""Streaming feature-drift monitor for live applicants.
+
+Every scored applicant is counted into a fixed-size histogram per
+feature, so memory is constant however much traffic goes by:
+- numeric features go into bins cut at the reference's 5% quantiles, plus
+  one bin for missing values
+- categoricals are counted per enum value, plus "other" and missing
+
+Live counts are kept in two windows of LOAN_DRIFT_WINDOW_SECONDS (default
+one hour). The current window rotates into the previous one, and reports
+cover both, so old traffic ages out.
+
+report() compares the live counts with the reference profile built from
+credit_risk_dataset.csv (drift_reference.json). For every feature it gives
+the population stability index, and for numerics also the binned
+Kolmogorov-Smirnov distance and the live median. PSI above 0.1 is
+flagged as "watch" and above 0.25 as "drift". With fewer than
+LOAN_DRIFT_MIN_OBSERVATIONS applicants (default 300) the status is
+"insufficient_data" and no gauges are set: a handful of applicants
+always looks drifted. observe() is pure Python and costs a few
+microseconds per applicant.
+
+Each process keeps its own counts. Under gunicorn, /drift reports the
+worker that answered it, and the Prometheus gauges take the maximum over
+workers.
+
+    python drift.py build                 # rebuild the reference profile from the dataset
+    python drift.py check portfolio.csv   # drift of a file against the reference
+"""
+import argparse
+import bisect
+import json
+import math
+import os
+import threading
+import time
+
+from loan_schema import FIELD_ORDER, FIELDS
+from metrics import FEATURE_KS, FEATURE_PSI, on_collect
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REFERENCE_PATH = os.environ.get("LOAN_DRIFT_REFERENCE", os.path.join(BASE_DIR, "drift_reference.json"))
+WINDOW_SECONDS = float(os.environ.get("LOAN_DRIFT_WINDOW_SECONDS", 3600))
+MIN_OBSERVATIONS = int(os.environ.get("LOAN_DRIFT_MIN_OBSERVATIONS", 300))
+QUANTILES = [i / 20 for i in range(1, 20)]
+WATCH_PSI = 0.1
+DRIFT_PSI = 0.25
+# Keeps empty bins from sending PSI to infinity
+EPSILON = 1e-4
+
+
+def _is_numeric(field):
+    return "enum" not in FIELDS[field]
+
+
+def build_reference(frame, source=None):
+    """Reference profile of frame: bin edges and shares per feature."""
+    import numpy as np
+
+    features = {}
+    for field in FIELD_ORDER:
+        values = frame[field]
+        missing = values.isna().to_numpy()
+        if _is_numeric(field):
+            present = values.to_numpy(dtype="float64")[~missing]
+            edges = np.unique(np.quantile(present, QUANTILES))
+            counts = np.bincount(np.searchsorted(edges, present, side="right"), minlength=len(edges) + 1)
+            features[field] = {
+                "type": "numeric",
+                "edges": edges.tolist(),
+                "min": float(present.min()),
+                "max": float(present.max()),
+                "median": float(np.median(present)),
+                "counts": counts.tolist() + [int(missing.sum())],
+            }
+        else:
+            categories = list(FIELDS[field]["enum"])
+            observed = values.astype(object)[~missing].value_counts()
+            counts = [int(observed.get(category, 0)) for category in categories]
+            other = int((~missing).sum()) - sum(counts)
+            features[field] = {"type": "categorical", "categories": categories,
+                               "counts": counts + [other, int(missing.sum())]}
+    return {"source": source, "rows": int(len(frame)), "features": features}
+
+
+def psi(expected, actual):
+    total_e, total_a = sum(expected), sum(actual)
+    value = 0.0
+    for e, a in zip(expected, actual):
+        e, a = max(e / total_e, EPSILON), max(a / total_a, EPSILON)
+        value += (a - e) * math.log(a / e)
+    return value
+
+
+def binned_ks(expected, actual):
+    # Largest gap between the two CDFs at the bin edges, missing values excluded
+    total_e, total_a = sum(expected), sum(actual)
+    if not total_e or not total_a:
+        return 0.0
+    gap = cum_e = cum_a = 0.0
+    for e, a in zip(expected, actual):
+        cum_e += e / total_e
+        cum_a += a / total_a
+        gap = max(gap, abs(cum_e - cum_a))
+    return gap
+
+
+def binned_median(profile, counts):
+    # Interpolated within the bin that holds the middle value
+    total = sum(counts)
+    if not total:
+        return None
+    bounds = [profile["min"], *profile["edges"], profile["max"]]
+    seen = 0
+    for index, count in enumerate(counts):
+        if count and seen + count >= total / 2:
+            low, high = bounds[index], max(bounds[index + 1], bounds[index])
+            return low + (high - low) * (total / 2 - seen) / count
+        seen += count
+    return bounds[-1]
+
+
+def status(value, observed=MIN_OBSERVATIONS):
+    if observed < MIN_OBSERVATIONS:
+        return "insufficient_data"
+    return "drift" if value > DRIFT_PSI else "watch" if value > WATCH_PSI else "ok"
+
+
+class DriftMonitor:
+    def __init__(self, reference, window_seconds=WINDOW_SECONDS):
+        self.reference = reference
+        self.window_seconds = window_seconds
+        self._features = []
+        for field in FIELD_ORDER:
+            profile = reference["features"][field]
+            if profile["type"] == "numeric":
+                self._features.append((field, profile["edges"], None))
+            else:
+                self._features.append((field, None, {c: i for i, c in enumerate(profile["categories"])}))
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def load(cls, path=REFERENCE_PATH, window_seconds=WINDOW_SECONDS):
+        with open(path) as f:
+            return cls(json.load(f), window_seconds)
+
+    def _empty(self):
+        return [[0] * len(self.reference["features"][field]["counts"]) for field, _, _ in self._features]
+
+    def reset(self):
+        with self._lock:
+            self._current, self._previous = self._empty(), self._empty()
+            self._window_started = time.monotonic()
+
+    def _rotate(self, now):
+        if now - self._window_started >= self.window_seconds:
+            # Two windows without a request leave nothing worth keeping
+            stale = now - self._window_started >= 2 * self.window_seconds
+            self._previous = self._empty() if stale else self._current
+            self._current = self._empty()
+            self._window_started = now
+
+    def _bin(self, value, edges, categories):
+        if value is None or value != value:
+            return -1
+        try:
+            if categories is not None:
+                return categories.get(value, len(categories))
+            return bisect.bisect_right(edges, float(value))
+        except (TypeError, ValueError):
+            return -1
+
+    def observe(self, row):
+        """Counts one applicant (a dict of raw field values)."""
+        bins = [self._bin(row.get(field), edges, categories) for field, edges, categories in self._features]
+        with self._lock:
+            self._rotate(time.monotonic())
+            for counts, index in zip(self._current, bins):
+                counts[index] += 1
+
+    def observe_frame(self, frame):
+        """Counts every row of a DataFrame of applicants at once."""
+        import numpy as np
+        import pandas as pd
+
+        additions = []
+        for field, edges, categories in self._features:
+            values = frame[field]
+            missing = values.isna().to_numpy()
+            if categories is None:
+                numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64")
+                missing = missing | np.isnan(numbers)
+                index = np.searchsorted(edges, numbers, side="right")
+            else:
+                index = pd.Categorical(values.astype(object), categories=list(categories)).codes.astype("int64")
+                index[index < 0] = len(categories)
+            index[missing] = len(edges) + 1 if categories is None else len(categories) + 1
+            additions.append(np.bincount(index, minlength=len(edges) + 2 if categories is None
+                                         else len(categories) + 2).tolist())
+        with self._lock:
+            self._rotate(time.monotonic())
+            for counts, added in zip(self._current, additions):
+                for index, count in enumerate(added):
+                    counts[index] += count
+
+    def counts(self):
+        with self._lock:
+            self._rotate(time.monotonic())
+            return [[a + b for a, b in zip(current, previous)]
+                    for current, previous in zip(self._current, self._previous)]
+
+    def report(self):
+        features = {}
+        for (field, _, _), counts in zip(self._features, self.counts()):
+            profile = self.reference["features"][field]
+            observed = sum(counts)
+            entry = {"observed": observed, "missing_share": counts[-1] / observed if observed else None}
+            if observed:
+                entry["psi"] = psi(profile["counts"], counts)
+                entry["status"] = status(entry["psi"], observed)
+            if profile["type"] == "numeric":
+                if observed:
+                    entry["ks"] = binned_ks(profile["counts"][:-1], counts[:-1])
+                entry["median"] = binned_median(profile, counts[:-1])
+                entry["reference_median"] = profile["median"]
+            else:
+                labels = profile["categories"] + ["other"]
+                entry["shares"] = {label: count / observed if observed else None
+                                   for label, count in zip(labels, counts)}
+                reference_total = sum(profile["counts"])
+                entry["reference_shares"] = {label: count / reference_total
+                                             for label, count in zip(labels, profile["counts"])}
+            features[field] = entry
+
+        flagged = {field: entry["status"] for field, entry in features.items()
+                   if entry.get("status") in ("watch", "drift")}
+        return {
+            "pid": os.getpid(),
+            "window_seconds": self.window_seconds,
+            "min_observations": MIN_OBSERVATIONS,
+            "reference": {"source": self.reference.get("source"), "rows": self.reference["rows"]},
+            "flagged": flagged,
+            "features": features,
+        }
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def monitor():
+    """The process-wide monitor, or None when there is no reference profile."""
+    global _monitor
+    if _monitor is None and os.path.exists(REFERENCE_PATH):
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = DriftMonitor.load()
+    return _monitor
+
+
+def observe(row):
+    if monitor() is not None:
+        _monitor.observe(row)
+
+
+def observe_frame(frame):
+    if monitor() is not None:
+        _monitor.observe_frame(frame)
+
+
+def refresh_gauges():
+    # Only once enough was observed: a cold or quiet process has nothing to report
+    if _monitor is None:
+        return
+    features = _monitor.report()["features"]
+    # Every applicant is counted for every feature, so any one gives the sample size
+    if next(iter(features.values()))["observed"] < MIN_OBSERVATIONS:
+        # Also drops the values set before the windows aged out
+        FEATURE_PSI.reset()
+        FEATURE_KS.reset()
+        return
+    for field, entry in features.items():
+        FEATURE_PSI.set(entry["psi"], feature=field)
+        if "ks" in entry:
+            FEATURE_KS.set(entry["ks"], feature=field)
+
+
+on_collect(refresh_gauges)
+
+
+def _reset_after_fork():
+    # A worker counts only its own traffic
+    global _monitor_lock
+    _monitor_lock = threading.Lock()
+    if _monitor is not None:
+        _monitor._lock = threading.Lock()
+        _monitor.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="write the reference profile")
+    build.add_argument("--dataset", help="CSV to profile (default: credit_risk_dataset.csv)")
+    build.add_argument("--output", default=REFERENCE_PATH)
+    check = commands.add_parser("check", help="compare a CSV of applicants with the reference")
+    check.add_argument("csv")
+    args = parser.parse_args(argv)
+
+    from dataset import DATASET_PATH, load, widen
+
+    if args.command == "build":
+        path = args.dataset or DATASET_PATH
+        reference = build_reference(widen(load(path, columns=FIELD_ORDER)), os.path.basename(path))
+        with open(args.output, "w") as f:
+            json.dump(reference, f, indent=1)
+        print(f"wrote {args.output} from {reference['rows']:,} rows")
+        return
+
+    checker = DriftMonitor.load()
+    checker.observe_frame(widen(load(args.csv, columns=FIELD_ORDER)))
+    report = checker.report()
+    for field, entry in report["features"].items():
+        ks = f"  KS {entry['ks']:.3f}" if "ks" in entry else ""
+        print(f"{field:>28}: PSI {entry['psi']:.4f}{ks}  {entry['status']}")
+
+
+if __name__ == "__main__":
+    main()
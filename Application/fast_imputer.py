@@ -0,0 +1,166 @@
+"""Closed-form replacement for the fitted IterativeImputer at serve time.
+
+The imputer in Model_pipeline.pkl replays a chain of linear regressors on
+every transform call. For a given set of missing columns that chain is one
+affine map from the observed values to the missing ones, so it can be
+composed once per missing-value pattern and applied with a single matrix
+product. Complete rows are passed through untouched.
+
+    python fast_imputer.py          # compare against IterativeImputer on the dataset
+"""
+import copy
+import os
+import pickle
+import sys
+
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, "Model_pipeline.pkl")
+DEFAULT_DATASET_PATH = os.path.join(BASE_DIR, "..", "Dataset", "credit_risk_dataset.csv")
+
+# Missing-value patterns present in credit_risk_dataset.csv, composed up front
+KNOWN_PATTERNS = [
+    ["person_emp_length"],
+    ["loan_int_rate"],
+    ["person_emp_length", "loan_int_rate"],
+]
+
+
+class PatternImputer(TransformerMixin, BaseEstimator):
+    def __init__(self, initial, sequence, feature_names=None):
+        self.initial = initial
+        self.sequence = sequence
+        self.feature_names = feature_names
+        self._patterns = {}
+
+    @classmethod
+    def from_iterative(cls, imputer, patterns=KNOWN_PATTERNS):
+        if imputer.sample_posterior or imputer.add_indicator or imputer.keep_empty_features:
+            raise ValueError("Only deterministic IterativeImputer without indicators can be composed")
+        if np.isfinite(imputer._min_value).any() or np.isfinite(imputer._max_value).any():
+            raise ValueError("Clipped imputations are not affine and cannot be composed")
+        sequence = []
+        for step in imputer.imputation_sequence_:
+            if not hasattr(step.estimator, "coef_"):
+                raise ValueError(f"Imputation estimator {type(step.estimator).__name__} is not linear")
+            sequence.append((int(step.feat_idx), np.asarray(step.neighbor_feat_idx),
+                             np.asarray(step.estimator.coef_, dtype=np.float64),
+                             float(step.estimator.intercept_)))
+
+        names = getattr(imputer, "feature_names_in_", None)
+        fast = cls(imputer.initial_imputer_.statistics_.astype(np.float64), sequence,
+                   None if names is None else list(names))
+        for pattern in patterns:
+            if names is not None and all(column in fast.feature_names for column in pattern):
+                fast._pattern([fast.feature_names.index(column) for column in pattern])
+        return fast
+
+    def fit(self, X, y=None):
+        # Built from an already fitted IterativeImputer, nothing to learn here
+        return self
+
+    def _pattern(self, missing):
+        # Tracks every column as (coefficients over all columns, constant) while
+        # the regressor chain runs, starting from observed = itself and
+        # missing = initial mean; the result is the composed affine map
+        key = tuple(sorted(int(i) for i in missing))
+        if key in self._patterns:
+            return self._patterns[key]
+
+        n_features = len(self.initial)
+        missing_mask = np.zeros(n_features, dtype=bool)
+        missing_mask[list(key)] = True
+        linear = np.eye(n_features)
+        constant = np.zeros(n_features)
+        linear[missing_mask] = 0.0
+        constant[missing_mask] = self.initial[missing_mask]
+
+        for feat, neighbors, coef, intercept in self.sequence:
+            if missing_mask[feat]:
+                linear[feat] = coef @ linear[neighbors]
+                constant[feat] = coef @ constant[neighbors] + intercept
+
+        observed = np.flatnonzero(~missing_mask)
+        missing = np.flatnonzero(missing_mask)
+        self._patterns[key] = (observed, missing, linear[np.ix_(missing, observed)].T.copy(), constant[missing])
+        return self._patterns[key]
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        mask = np.isnan(X)
+        incomplete = np.flatnonzero(mask.any(axis=1))
+        if len(incomplete) == 0:
+            return X
+        if mask.all():
+            # IterativeImputer stops at the initial mean fill in this case
+            return np.where(mask, self.initial, X)
+
+        # One matrix product per distinct missing-value pattern
+        keys = mask[incomplete] @ (1 << np.arange(X.shape[1]))
+        for key in np.unique(keys):
+            rows = incomplete[keys == key]
+            observed, missing, linear, constant = self._pattern(np.flatnonzero(mask[rows[0]]))
+            X[np.ix_(rows, missing)] = X[np.ix_(rows, observed)] @ linear + constant
+        return X
+
+    def get_feature_names_out(self, input_features=None):
+        if input_features is not None:
+            return np.asarray(input_features, dtype=object)
+        return np.asarray(self.feature_names, dtype=object)
+
+
+def serving_pipeline(pipeline):
+    """Returns a copy of the pipeline whose numeric imputer is a PatternImputer.
+
+    The original pipeline is returned unchanged if its imputer cannot be
+    composed (for example a KNN or clipped imputer).
+    """
+    try:
+        num_pipe = pipeline.named_steps["preprocessor"].named_transformers_["num"]
+        imputer = PatternImputer.from_iterative(num_pipe.named_steps["imputation"])
+    except (KeyError, AttributeError, ValueError):
+        return pipeline
+
+    serving = copy.deepcopy(pipeline)
+    num_pipe = serving.named_steps["preprocessor"].named_transformers_["num"]
+    index = [name for name, _ in num_pipe.steps].index("imputation")
+    num_pipe.steps[index] = ("imputation", imputer)
+    return serving
+
+
+def verify(model_path=DEFAULT_MODEL_PATH, dataset_path=DEFAULT_DATASET_PATH, tolerance=1e-9):
+    import time
+    import pandas as pd
+
+    with open(model_path, "rb") as f:
+        pipeline = pickle.load(f)
+    serving = serving_pipeline(pipeline)
+    if serving is pipeline:
+        print("Imputer cannot be composed, serving pipeline is unchanged")
+        return False
+
+    data = pd.read_csv(dataset_path)[list(pipeline.named_steps["preprocessor"].feature_names_in_)]
+    num_pipe = pipeline.named_steps["preprocessor"].named_transformers_["num"]
+    num_cols = pipeline.named_steps["preprocessor"].transformers_[0][2]
+    iterative = num_pipe.named_steps["imputation"]
+    fast = serving.named_steps["preprocessor"].named_transformers_["num"].named_steps["imputation"]
+
+    expected = iterative.transform(data[num_cols])
+    actual = fast.transform(data[num_cols])
+    max_diff = float(np.max(np.abs(actual - expected)))
+    label_mismatches = int(np.sum(serving.predict(data) != pipeline.predict(data)))
+    print(f"rows: {len(data)}, max imputed difference: {max_diff:.3e}, label mismatches: {label_mismatches}")
+
+    row = data[data.notna().all(axis=1)].head(1)
+    for name, model in (("iterative", pipeline), ("pattern", serving)):
+        start = time.perf_counter()
+        for _ in range(200):
+            model.predict(row)
+        print(f"{name}: {(time.perf_counter() - start) / 200 * 1000:.2f} ms per single-row predict")
+    return max_diff <= tolerance and label_mismatches == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify() else 1)
@@ -1,25 +1,318 @@
-from flask import Flask, request, jsonify
-import pickle
+from flask import Flask, Response, g, request, jsonify
+import json
+import os
+import sys
+import threading
+import time
 import pandas as pd
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from audit_log import AuditBacklog, audit, entry, lookup, new_request_id, record
+from drift import monitor, observe, observe_frame
+from explain import explain_frame, explanation, predict_explained_versioned, predict_positive
+from loan_schema import FIELD_ORDER, NUMERIC_FIELDS, validate_frame, validate_row
+from metrics import (CONTENT_TYPE, ERRORS, MODEL_INFO, REQUEST_SECONDS, REQUESTS, on_collect,
+                     record_decisions, render, stage)
+from micro_batcher import MicroBatcher
+from model_registry import current, ensure_warm, get_version, is_warm
+from risk_policy import DECISIONS, Policy, current_policy, model_label
+from sampling_profiler import profiler
+from score_cache import cache, predict_cached
+from what_if import sweep
+
 app = Flask(__name__)
+# Bodies above this are refused with 413 before they are read
+app.config['MAX_CONTENT_LENGTH'] = int(float(os.environ.get('MAX_REQUEST_MB', 16)) * 1024 * 1024)
+
+# Set by the production server on SIGTERM so /readyz fails while requests drain
+draining = threading.Event()
+
+# The sampling profiler endpoints expose stack traces, so they are opt-in
+PROFILER_ENABLED = os.environ.get('LOAN_PROFILER_ENABLED', '').lower() in ('1', 'true', 'yes')
+# So is reading applicant records back from the audit log
+AUDIT_API_ENABLED = os.environ.get('LOAN_AUDIT_API_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+# Concurrent /predict calls are coalesced into one model call per window
+batcher = MicroBatcher(
+    predict_explained_versioned,
+    max_wait=float(os.environ.get('BATCH_MAX_WAIT_MS', 2)) / 1000,
+    max_batch=int(os.environ.get('BATCH_MAX_SIZE', 64)),
+)
+
+
+def refresh_model_info():
+    # Never triggers a load; a cold process reports no version yet
+    if is_warm():
+        MODEL_INFO.replace(1, model_version=get_version())
+
+
+on_collect(refresh_model_info)
+
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+    # A caller-supplied X-Request-ID is kept so audit records can be matched to its logs
+    g.request_id = request.headers.get('X-Request-ID', '')[:128] or new_request_id()
+
+
+@app.after_request
+def count_request(response):
+    endpoint = request.endpoint or 'unmatched'
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    REQUEST_SECONDS.observe(time.perf_counter() - g.started, endpoint=endpoint)
+    response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+def parse_batch(body, content_type):
+    # Accepts a JSON array, or newline-delimited JSON with one applicant per line
+    text = body.decode('utf-8')
+    if 'ndjson' in content_type or not text.lstrip().startswith('['):
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return json.loads(text)
 
-model = pickle.load(open('Model_pipeline.pkl', 'rb'))
 
 @app.route('/predict', methods=['POST'])
 def predict():
 
-    data = request.json
+    with stage('parse'):
+        # Malformed JSON comes back as None and fails validation like any non-object
+        data = request.get_json(silent=True)
+    with stage('validate'):
+        errors = validate_row(data)
+    if errors:
+        ERRORS.inc(endpoint='predict', kind='validation')
+        return jsonify({'errors': errors}), 400
     try:
         
-        input_data = pd.DataFrame([data])
-        
-        prediction = model.predict(input_data)
+        with stage('score'):
+            (probability, contributions), version = predict_cached(data, batcher.predict)
+        decision = current_policy().decide(probability, data.get('loan_intent'))
+        record(g.request_id, 'api', version, probability, decision, data)
+        record_decisions(version, [decision['decision']])
+        observe(data)
 
-        return jsonify({'prediction': int(prediction[0])})
+        with stage('serialize'):
+            return jsonify({'prediction': model_label(probability), 'probability': probability,
+                            **decision, 'explanation': contributions, 'model_version': version})
         
+    except AuditBacklog as e:
+        ERRORS.inc(endpoint='predict', kind='audit')
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
+        ERRORS.inc(endpoint='predict', kind='scoring')
         return jsonify({'error': str(e)})
 
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    try:
+        with stage('parse'):
+            applicants = parse_batch(request.get_data(), request.content_type or '')
+    except ValueError as e:
+        ERRORS.inc(endpoint='predict_batch', kind='payload')
+        return jsonify({'error': f"Invalid JSON payload: {e}"}), 400
+
+    if not isinstance(applicants, list):
+        ERRORS.inc(endpoint='predict_batch', kind='payload')
+        return jsonify({'error': "Expected a JSON array of applicants"}), 400
+
+    results = [None] * len(applicants)
+    objects = []
+    for i, row in enumerate(applicants):
+        if isinstance(row, dict):
+            objects.append(i)
+        else:
+            results[i] = {'index': i, 'errors': ["applicant must be a JSON object"]}
+
+    # One columnar frame, validated column by column before it reaches the model
+    with stage('frame'):
+        columns = {field: [applicants[i].get(field) for i in objects] for field in FIELD_ORDER}
+        frame = pd.DataFrame(columns, columns=FIELD_ORDER)
+    with stage('validate'):
+        invalid = validate_frame(frame)
+    for position, errors in invalid.items():
+        results[objects[position]] = {'index': objects[position], 'errors': errors}
+    valid_positions = [p for p in range(len(objects)) if p not in invalid]
+    valid_index = [objects[p] for p in valid_positions]
+    if len(valid_index) < len(applicants):
+        ERRORS.inc(len(applicants) - len(valid_index), endpoint='predict_batch', kind='validation')
+
+    # ?explain=1 adds per-field contributions from the same model pass
+    explain = request.args.get('explain', '').lower() in ('1', 'true', 'yes')
+    loaded = current()
+    policy = current_policy()
+    if valid_index:
+        try:
+            # A single pipeline call for every valid row
+            with stage('frame'):
+                input_data = frame.iloc[valid_positions].reset_index(drop=True)
+                for field in NUMERIC_FIELDS:
+                    input_data[field] = pd.to_numeric(input_data[field])
+
+            if explain:
+                positives, base_values, contributions = explain_frame(loaded.model, input_data)
+            else:
+                positives = predict_positive(loaded.model, input_data)
+        except Exception as e:
+            ERRORS.inc(endpoint='predict_batch', kind='scoring')
+            return jsonify({'error': str(e)}), 500
+
+        decisions, grades = policy.decide_many(positives, input_data['loan_intent'])
+        try:
+            audit.record([entry(g.request_id, 'api_batch', loaded.version, proba,
+                                {'policy': policy.name, 'decision': decision, 'risk_grade': grade}, applicants[i])
+                          for i, proba, decision, grade in zip(valid_index, positives, decisions, grades)])
+        except AuditBacklog as e:
+            ERRORS.inc(endpoint='predict_batch', kind='audit')
+            return jsonify({'error': str(e)}), 503
+        record_decisions(loaded.version, decisions)
+        observe_frame(input_data)
+        for n, (i, proba, decision, grade) in enumerate(zip(valid_index, positives, decisions, grades)):
+            results[i] = {'index': i, 'prediction': model_label(proba), 'probability': float(proba),
+                          'decision': decision, 'risk_grade': grade}
+            if explain:
+                results[i]['explanation'] = explanation(base_values[n], contributions[n])
+
+    with stage('serialize'):
+        return jsonify({
+            'results': results,
+            'scored': len(valid_index),
+            'failed': len(applicants) - len(valid_index),
+            'model_version': loaded.version,
+            'policy': policy.name,
+        })
+
+
+@app.route('/predict/what-if', methods=['POST'])
+def predict_what_if():
+    # Scores a grid of perturbed copies of one applicant in a single call
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': "Expected a JSON object with 'applicant' and optional 'axes'"}), 400
+    applicant = body.get('applicant')
+    errors = validate_row(applicant)
+    if errors:
+        return jsonify({'errors': errors}), 400
+
+    try:
+        return jsonify(sweep(applicant, body.get('axes')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/policy', methods=['GET'])
+def get_policy():
+    return jsonify(current_policy().to_dict())
+
+
+@app.route('/policy/evaluate', methods=['POST'])
+def evaluate_policy():
+    # Applies a candidate policy to already-scored probabilities, no model call
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({'error': "Expected a JSON object with 'applicants' and optional 'policy'"}), 400
+    try:
+        policy = Policy.from_dict(body['policy']) if 'policy' in body else current_policy()
+        applicants = body['applicants']
+        probabilities = [float(a['probability']) for a in applicants]
+        intents = [a.get('loan_intent') for a in applicants]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f"Invalid policy evaluation request: {e}"}), 400
+    # NaN would fall through every threshold into the riskiest band instead of failing
+    invalid = [i for i, p in enumerate(probabilities) if not 0.0 <= p <= 1.0]
+    if invalid:
+        return jsonify({'error': "Probabilities must be finite numbers between 0 and 1",
+                        'invalid_indices': invalid[:100]}), 400
+
+    decisions, grades = policy.decide_many(probabilities, intents)
+    return jsonify({
+        'policy': policy.name,
+        'results': [{'decision': d, 'risk_grade': g} for d, g in zip(decisions, grades)],
+        'counts': {d: int((decisions == d).sum()) for d in DECISIONS},
+    })
+
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness: the process is up and serving requests
+    return jsonify({'status': 'alive'})
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    # Readiness: the model is loaded and warm, and the server is not shutting down
+    if draining.is_set():
+        return jsonify({'status': 'draining'}), 503
+    # serve.py warms the model before forking; under `flask run` the first probe loads it
+    try:
+        loaded = ensure_warm()
+    except Exception as e:
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+    return jsonify({'status': 'ready', 'model_version': loaded.version})
+
+
+@app.errorhandler(413)
+def payload_too_large(e):
+    return jsonify({'error': f"Request body exceeds {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+
+
+@app.route('/predict/stats', methods=['GET'])
+def predict_stats():
+    return jsonify({'batcher': batcher.stats(), 'cache': cache.stats()})
+
+
+@app.route('/drift', methods=['GET'])
+def drift():
+    # Live applicants against the training reference, for this worker
+    if monitor() is None:
+        return jsonify({'error': "No drift reference profile, run drift.py build"}), 404
+    return jsonify(monitor().report())
+
+
+@app.route('/audit', methods=['GET'])
+def audit_lookup():
+    # ?request_id=... or ?applicant_id=..., newest first
+    if not AUDIT_API_ENABLED:
+        return jsonify({'error': "Audit lookup disabled, set LOAN_AUDIT_API_ENABLED=1"}), 404
+    request_id, applicant_id = request.args.get('request_id'), request.args.get('applicant_id')
+    if not request_id and not applicant_id:
+        return jsonify({'error': "Pass request_id or applicant_id"}), 400
+    # complete is false when records were still queued after the wait, e.g. while the database is locked
+    complete = audit.flush(timeout=5)
+    return jsonify({'records': lookup(request_id or None, applicant_id, request.args.get('limit', 100, type=int)),
+                    'complete': complete})
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render(), content_type=CONTENT_TYPE)
+
+
+@app.route('/debug/profile', methods=['GET', 'POST', 'DELETE'])
+def profile():
+    # POST starts sampling this worker, GET reads the stacks so far, DELETE stops
+    if not PROFILER_ENABLED:
+        return jsonify({'error': "Profiler disabled, set LOAN_PROFILER_ENABLED=1"}), 404
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        try:
+            interval = float(body.get('interval_ms', 5)) / 1000
+            duration = float(body.get('seconds', 30))
+        except (TypeError, ValueError):
+            return jsonify({'error': "interval_ms and seconds must be numbers"}), 400
+        if not 0.001 <= interval <= 1 or duration <= 0:
+            return jsonify({'error': "interval_ms must be 1-1000 and seconds positive"}), 400
+        started = profiler.start(interval, duration, include_idle=bool(body.get('include_idle')))
+        return jsonify({'started': started, 'pid': os.getpid()}), 202 if started else 409
+    if request.method == 'DELETE':
+        profiler.stop()
+    report = profiler.report(request.args.get('limit', 50, type=int))
+    if request.args.get('format') == 'collapsed':
+        return Response(report['collapsed'] + '\n', content_type='text/plain; charset=utf-8')
+    return jsonify(dict(report, pid=os.getpid()))
+
 if __name__ == '__main__':
+    # Development server only; use serve.py for production
+    ensure_warm()
     app.run(debug=True)
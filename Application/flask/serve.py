@@ -0,0 +1,123 @@
+"""Production server for the Flask API: gunicorn with the model preloaded before fork.
+
+    python flask/serve.py --workers 4 --threads 8 --bind 0.0.0.0:8000
+
+The master process loads and warms the model once, freezes the garbage
+collector and then forks the workers, which share the model pages
+copy-on-write instead of each unpickling it. Threaded workers let the
+micro-batcher coalesce concurrent /predict calls inside each worker.
+
+On SIGTERM a worker fails /readyz straight away, finishes the requests it
+has in flight and exits within --graceful-timeout seconds. Every option
+can also be set through the environment variable named in its help.
+
+Each worker keeps its own metrics; they are shared through a directory of
+per-process files so /metrics reports the whole server. Workers append to
+one audit database and write out their queued records on exit.
+"""
+import argparse
+import os
+import shutil
+import signal
+import sys
+import tempfile
+
+from gunicorn.app.base import BaseApplication
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import flask_api  # noqa: E402
+import metrics  # noqa: E402
+from audit_log import audit  # noqa: E402
+from model_registry import preload  # noqa: E402
+
+
+def _env(name, default, cast=str):
+    return cast(os.environ.get(name, default))
+
+
+def post_worker_init(worker):
+    # Chain onto gunicorn's own SIGTERM handler, which stops the worker gracefully
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def drain(signum, frame):
+        flask_api.draining.set()
+        if callable(previous):
+            previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, drain)
+
+
+def worker_exit(server, worker):
+    # Decisions still queued for the audit log are written before the worker goes
+    audit.close()
+
+
+class Server(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # With preload_app this runs once, in the master, before any fork
+        preload()
+        return flask_api.app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bind", default=_env("WEB_BIND", "0.0.0.0:8000"), help="WEB_BIND")
+    parser.add_argument("--workers", type=int, default=_env("WEB_WORKERS", os.cpu_count(), int),
+                        help="worker processes, WEB_WORKERS (default: one per core)")
+    parser.add_argument("--threads", type=int, default=_env("WEB_THREADS", 8, int),
+                        help="request threads per worker, WEB_THREADS")
+    parser.add_argument("--keepalive", type=int, default=_env("WEB_KEEPALIVE", 5, int),
+                        help="seconds an idle keep-alive connection stays open, WEB_KEEPALIVE")
+    parser.add_argument("--timeout", type=int, default=_env("WEB_TIMEOUT", 30, int),
+                        help="seconds before a stuck worker is restarted, WEB_TIMEOUT")
+    parser.add_argument("--graceful-timeout", type=int, default=_env("WEB_GRACEFUL_TIMEOUT", 30, int),
+                        help="seconds to drain in-flight requests on SIGTERM, WEB_GRACEFUL_TIMEOUT")
+    parser.add_argument("--max-requests", type=int, default=_env("WEB_MAX_REQUESTS", 0, int),
+                        help="recycle a worker after this many requests (0 = never), WEB_MAX_REQUESTS")
+    parser.add_argument("--backlog", type=int, default=_env("WEB_BACKLOG", 2048, int),
+                        help="pending connection queue, WEB_BACKLOG")
+    parser.add_argument("--metrics-dir", default=os.environ.get("LOAN_METRICS_DIR"),
+                        help="where workers share metrics, LOAN_METRICS_DIR (default: a temporary directory)")
+    parser.add_argument("--max-request-mb", type=float, default=_env("MAX_REQUEST_MB", 16, float),
+                        help="largest accepted request body, MAX_REQUEST_MB")
+    args = parser.parse_args(argv)
+
+    flask_api.app.config["MAX_CONTENT_LENGTH"] = int(args.max_request_mb * 1024 * 1024)
+    metrics_dir = args.metrics_dir or tempfile.mkdtemp(prefix="loan-metrics-")
+    metrics.configure(metrics_dir)
+    metrics.clear_directory(metrics_dir)
+
+    def on_exit(server):
+        if not args.metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+    Server({
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": "gthread",
+        "threads": args.threads,
+        "keepalive": args.keepalive,
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests // 10,
+        "backlog": args.backlog,
+        "preload_app": True,
+        "post_worker_init": post_worker_init,
+        "worker_exit": worker_exit,
+        "on_exit": on_exit,
+        "accesslog": None,
+        "errorlog": "-",
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Import-time report for the Streamlit app.
+
+app.py imports only the page chosen in the sidebar. For each page this
+records what its import and render cost on the first (cold) run in the
+process, and which heavy libraries were loaded by the time it painted.
+The first run of every page is logged; with LOAN_IMPORT_REPORT=1 the
+numbers for the current run are also shown in the sidebar.
+"""
+import logging
+import sys
+
+HEAVY_MODULES = ("numpy", "pandas", "pyarrow", "altair", "sklearn", "lightgbm", "groq", "httpx")
+
+logger = logging.getLogger(__name__)
+_first_runs = {}
+
+
+def loaded_heavy_modules():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def record(page, import_seconds, render_seconds):
+    report = {
+        "page": page,
+        "import_ms": import_seconds * 1000,
+        "render_ms": render_seconds * 1000,
+        "first_run": page not in _first_runs,
+        "heavy_modules": loaded_heavy_modules(),
+    }
+    if report["first_run"]:
+        _first_runs[page] = report
+        logger.info("%s first paint: import %.0f ms, render %.0f ms, heavy modules loaded: %s",
+                    page, report["import_ms"], report["render_ms"], ", ".join(report["heavy_modules"]) or "none")
+    return report
+
+
+def first_runs():
+    return dict(_first_runs)
@@ -0,0 +1,191 @@
+"""Local slot filling for the chatbot intake.
+
+Answers to the ten applicant questions ("32", "rent", "n") are parsed and
+validated against the loan_eligibility tool schema here instead of costing
+an LLM round trip each. `advance` returns one of three actions:
+
+    "reply"  answer locally with the returned message
+    "score"  every field is collected and confirmed, run the model
+    "llm"    free text outside the questions, hand the turn to the LLM
+
+Only the summary the user confirmed is scored. Corrections at the
+confirmation ("no, the age is 40") are applied here and the summary is
+shown again. Whatever the LLM says in between never reaches the model
+without another confirmation.
+"""
+import re
+
+from loan_schema import FIELDS, FIELD_LABELS, FIELD_ORDER
+
+START, COLLECTING, CONFIRM, DONE = "start", "collecting", "confirm", "done"
+
+YES = {"Y", "YES", "YEAH", "YEP", "SURE", "OK", "OKAY", "CORRECT", "CONFIRM", "CONFIRMED",
+       "PROCEED", "RIGHT", "TRUE", "YESPLEASE", "YESTHATSCORRECT", "YESTHATISCORRECT"}
+NO = {"N", "NO", "NOPE", "NAH", "FALSE", "INCORRECT", "WRONG"}
+
+# Spoken forms of enum values, keyed by the normalized answer
+ENUM_ALIASES = {
+    "cb_person_default_on_file": {**{word: "Y" for word in YES}, **{word: "N" for word in NO}},
+    "person_home_ownership": {"RENTING": "RENT", "RENTED": "RENT", "OWNED": "OWN", "OWNER": "OWN",
+                              "MORTGAGED": "MORTGAGE"},
+    "loan_intent": {"DEBT": "DEBTCONSOLIDATION", "HOME": "HOMEIMPROVEMENT",
+                    "BUSINESS": "VENTURE", "SCHOOL": "EDUCATION", "STUDIES": "EDUCATION"},
+}
+
+QUESTIONS = {
+    "person_age": "What is the applicant's age?",
+    "person_income": "What is the applicant's annual income in dollars?",
+    "person_home_ownership": "What is the applicant's home ownership status?",
+    "person_emp_length": "How many years has the applicant been employed?",
+    "loan_intent": "What is the purpose of the loan?",
+    "loan_grade": "What is the loan grade?",
+    "loan_amnt": "What loan amount is requested, in dollars?",
+    "loan_int_rate": "What is the interest rate of the loan, in percent?",
+    "cb_person_default_on_file": "Has the applicant defaulted on a loan before?",
+    "cb_person_cred_hist_length": "How long is the applicant's credit history, in years?",
+}
+
+# Words that name a field in a correction, e.g. "the income should be 55k"
+FIELD_WORDS = {
+    "age": "person_age",
+    "income": "person_income",
+    "salary": "person_income",
+    "home": "person_home_ownership",
+    "ownership": "person_home_ownership",
+    "employment": "person_emp_length",
+    "employed": "person_emp_length",
+    "purpose": "loan_intent",
+    "intent": "loan_intent",
+    "grade": "loan_grade",
+    "amount": "loan_amnt",
+    "interest": "loan_int_rate",
+    "rate": "loan_int_rate",
+    "default": "cb_person_default_on_file",
+    "defaulted": "cb_person_default_on_file",
+    "credit": "cb_person_cred_hist_length",
+    "history": "cb_person_cred_hist_length",
+}
+_FIELD_WORD_RE = re.compile(r"\b(" + "|".join(FIELD_WORDS) + r")\b", re.I)
+_FILLER_RE = re.compile(r"^(?:\s|[=:,]|\b(?:length|is|was|should|be|to|of|now|actually)\b)*", re.I)
+
+_NUMBER_RE = re.compile(
+    r"^\$?\s*(-?\d[\d,]*(?:\.\d+)?)\s*(k|m)?\s*(%|percent|years?(?: old)?|yrs?|dollars?)?$", re.I)
+_MULTIPLIERS = {"k": 1_000, "m": 1_000_000}
+
+
+def _normalize(text):
+    return re.sub(r"[^A-Z0-9]", "", text.upper())
+
+
+def _range_hint(spec):
+    if "enum" in spec:
+        return "/".join(spec["enum"])
+    low, high = spec.get("minimum"), spec.get("maximum")
+    if low is not None and high is not None:
+        return f"{low}-{high}"
+    return None
+
+
+def question(field):
+    hint = _range_hint(FIELDS[field])
+    return f"{QUESTIONS[field]} ({hint})" if hint else QUESTIONS[field]
+
+
+def parse_answer(field, text):
+    """Returns (value, error). Both are None when the text is not a plain answer."""
+    spec = FIELDS[field]
+    if "enum" in spec:
+        key = _normalize(text)
+        value = key if key in spec["enum"] else ENUM_ALIASES.get(field, {}).get(key)
+        if value is None:
+            return None, None
+        return value, None
+
+    match = _NUMBER_RE.match(text.strip())
+    if not match:
+        return None, None
+    value = float(match.group(1).replace(",", "")) * _MULTIPLIERS.get((match.group(2) or "").lower(), 1)
+    if spec["type"] == "integer":
+        if not value.is_integer():
+            return None, "Please enter a whole number."
+        value = int(value)
+    if "minimum" in spec and value < spec["minimum"] or "maximum" in spec and value > spec["maximum"]:
+        return None, f"That is outside the accepted range ({_range_hint(spec)})."
+    return value, None
+
+
+def parse_correction(text):
+    """Returns (field, value, error) for a correction naming one field.
+
+    field is None when the text names no field, or more than one; value
+    is None when the rest of the text is not a plain answer.
+    """
+    matches = list(_FIELD_WORD_RE.finditer(text))
+    fields = {FIELD_WORDS[match.group(1).lower()] for match in matches}
+    if len(fields) != 1:
+        return None, None, None
+    field = fields.pop()
+    value, error = parse_answer(field, _FILLER_RE.sub("", text[matches[-1].end():]).strip(" .!"))
+    return field, value, error
+
+
+def pending_field(collected_data):
+    for field in FIELD_ORDER:
+        if field not in collected_data:
+            return field
+    return None
+
+
+def confirmation(collected_data):
+    lines = [f"- {FIELD_LABELS[field]}: {collected_data[field]}" for field in FIELD_ORDER]
+    return "Please confirm the details below:\n\n" + "\n".join(lines) + "\n\nIs this information correct? (yes/no)"
+
+
+def advance(step, collected_data, text):
+    """Moves the intake one user message forward; returns (step, action, message).
+
+    `collected_data` is updated in place with every accepted answer.
+    """
+    answer = _normalize(text)
+
+    if step in (START, DONE):
+        if answer in YES:
+            collected_data.clear()
+            return COLLECTING, "reply", question(FIELD_ORDER[0])
+        return step, "llm", None
+
+    if step == CONFIRM:
+        if answer in YES:
+            return DONE, "score", None
+        if answer in NO:
+            return CONFIRM, "reply", 'Which detail should change? For example: "the age is 40".'
+
+    field = pending_field(collected_data)
+    if field is None:
+        correction, value, error = parse_correction(text)
+        if correction is None:
+            if step == CONFIRM:
+                # The LLM may answer, but it cannot change the details: they are confirmed again first
+                return COLLECTING, "llm", None
+            return CONFIRM, "reply", confirmation(collected_data)
+        if value is None:
+            # Ask for the corrected field again, the summary follows the answer
+            del collected_data[correction]
+            prefix = "" if error is None else f"{error} "
+            return COLLECTING, "reply", prefix + question(correction)
+        collected_data[correction] = value
+        return CONFIRM, "reply", f"Updated, {FIELD_LABELS[correction].lower()}: {value}. " + confirmation(collected_data)
+
+    value, error = parse_answer(field, text)
+    if error is not None:
+        return COLLECTING, "reply", f"{error} {question(field)}"
+    if value is None:
+        # A side question or an answer in words: the LLM replies, the pending field stays the same,
+        # so the next plain answer is still read as this field
+        return COLLECTING, "llm", None
+
+    collected_data[field] = value
+    next_field = pending_field(collected_data)
+    if next_field is None:
+        return CONFIRM, "reply", confirmation(collected_data)
+    return COLLECTING, "reply", f"Noted, {value}. {question(next_field)}"
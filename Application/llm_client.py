@@ -0,0 +1,194 @@
+"""Streaming chat layer used by the chatbot page.
+
+`ChatClient.stream` starts a completion on a background thread and returns a
+`ChatStream` right away. Iterating it yields text tokens as they arrive (it
+can be passed straight to `st.write_stream`); once exhausted it also holds
+the full text, any tool calls and the timings. Because the request is
+already running when `stream` returns, a follow-up completion can be
+started before the page finishes rendering the previous result.
+
+Backends turn provider responses into simple events:
+    ("text", token)
+    ("tool_call", index, id, name, arguments_fragment)
+
+`GroqBackend` talks to Groq over one pooled HTTP client; `FakeBackend`
+replays scripted replies locally so latency can be measured offline.
+
+    python llm_client.py        # time-to-first-token vs. blocking, fake backend
+"""
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from chat_context import prompt_tokens
+
+_DONE = object()
+
+
+class ChatStream:
+    def __init__(self):
+        self.content = ""
+        self.tool_calls = []
+        self.error = None
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.finished_at = None
+        self._events = queue.Queue()
+        self._finished = threading.Event()
+        self._calls = {}
+
+    # Producer side, called from the worker thread
+    def _feed(self, events):
+        try:
+            for event in events:
+                if self.first_token_at is None:
+                    self.first_token_at = time.perf_counter()
+                if event[0] == "text":
+                    self._events.put(event[1])
+                else:
+                    _, index, call_id, name, arguments = event
+                    call = self._calls.setdefault(index, {"id": None, "name": "", "arguments": ""})
+                    call["id"] = call_id or call["id"]
+                    call["name"] += name or ""
+                    call["arguments"] += arguments or ""
+        except Exception as e:
+            self.error = e
+        finally:
+            self.tool_calls = [self._calls[i] for i in sorted(self._calls)]
+            self.finished_at = time.perf_counter()
+            self._events.put(_DONE)
+
+    def __iter__(self):
+        if self._finished.is_set():
+            return
+        while True:
+            token = self._events.get()
+            if token is _DONE:
+                self._finished.set()
+                if self.error is not None:
+                    raise self.error
+                return
+            self.content += token
+            yield token
+
+    def result(self):
+        # Drains the stream without rendering it and returns the full text
+        for _ in self:
+            pass
+        return self.content
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def total_time(self):
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class ChatClient:
+    def __init__(self, backend, max_workers=8):
+        self.backend = backend
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    def stream(self, model, messages, **options):
+        chat_stream = ChatStream()
+        # Copy the list, the caller keeps appending to session messages
+        messages = [dict(m) for m in messages]
+        self._pool.submit(lambda: chat_stream._feed(self.backend.stream(model, messages, **options)))
+        return chat_stream
+
+    def complete(self, model, messages, **options):
+        chat_stream = self.stream(model, messages, **options)
+        chat_stream.result()
+        return chat_stream
+
+
+class GroqBackend:
+    def __init__(self, api_key, max_connections=20, timeout=60.0):
+        import httpx
+        from groq import Groq
+
+        # One keep-alive pool for every session in the process
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+        self.client = Groq(api_key=api_key, http_client=http_client)
+
+    def stream(self, model, messages, **options):
+        response = self.client.chat.completions.create(
+            model=model, messages=messages, stream=True, **options)
+        for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                yield ("text", delta.content)
+            for call in delta.tool_calls or []:
+                function = call.function
+                yield ("tool_call", call.index, call.id,
+                       function.name if function else None,
+                       function.arguments if function else None)
+
+
+class FakeBackend:
+    """Replays scripted replies with a fixed latency profile.
+
+    Each reply is either a string, streamed word by word, or a dict
+    {"tool_call": name, "arguments": {...}}. Replies are used in order and the
+    last one repeats once the script runs out. `prompt_token_delay` adds
+    prefill time per prompt token, so larger prompts answer later.
+    """
+
+    def __init__(self, replies, first_token_delay=0.3, token_delay=0.02, prompt_token_delay=0.0):
+        self.replies = list(replies)
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.prompt_token_delay = prompt_token_delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def stream(self, model, messages, **options):
+        with self._lock:
+            reply = self.replies[min(len(self.calls), len(self.replies) - 1)]
+            self.calls.append({"model": model, "messages": messages, "options": options})
+        time.sleep(self.first_token_delay + prompt_tokens(messages) * self.prompt_token_delay)
+        if isinstance(reply, dict):
+            yield ("tool_call", 0, "call_0", reply["tool_call"], json.dumps(reply["arguments"]))
+            return
+        for i, word in enumerate(reply.split(" ")):
+            if i:
+                time.sleep(self.token_delay)
+            yield ("text", word if i == 0 else " " + word)
+
+
+def main():
+    reply = " ".join(["token"] * 200)
+    client = ChatClient(FakeBackend([reply]))
+    messages = [{"role": "user", "content": "Explain the result"}]
+
+    chat_stream = client.stream("fake", messages)
+    for _ in chat_stream:
+        pass
+    print(f"streamed: first token {chat_stream.time_to_first_token * 1000:.0f} ms, "
+          f"complete {chat_stream.total_time * 1000:.0f} ms")
+
+    # A prefetched follow-up overlaps with whatever the caller does meanwhile
+    start = time.perf_counter()
+    follow_up = client.stream("fake", messages)
+    time.sleep(0.5)
+    follow_up.result()
+    print(f"prefetched follow-up with 500 ms of rendering: {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"(sequential would be {(0.5 + follow_up.total_time) * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,60 @@
 import streamlit as st
-import pickle
 import json
-import pandas as pd
-from groq import Groq
-import os 
+import textwrap
 from styles import apply_styles
 from chatbot_prompt import get_initial_messages
+from model_registry import get_model
+from risk_policy import AUTO_APPROVE, DECLINE, current_policy, model_label
+from llm_client import ChatClient, GroqBackend
+from chat_context import compact_messages
+from loan_schema import FIELD_ORDER, TOOLS, validate_row
+from audit_log import AuditBacklog, new_request_id, record
+from drift import observe
+from metrics import ERRORS, record_decisions, stage
+from intake import advance, confirmation, CONFIRM
 
-   
-# Load API key securely from Streamlit secrets
-api_key = st.secrets["GROQ_API_KEY"]
-
-client = Groq(api_key=api_key)
 MODEL = "llama3-70b-8192" 
 
+
 @st.cache_resource
+def get_client():
+    # Built on the first LLM call, not when the page is imported: reads the
+    # API key from Streamlit secrets and shares one pooled HTTP connection
+    # set across sessions
+    return ChatClient(GroqBackend(st.secrets["GROQ_API_KEY"]))
+
 def load_model():
     try:
-        model_path = os.path.join('Application', 'Model_pipeline.pkl')
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file not found at {model_path}")
-        
-        with open(model_path, 'rb') as f:
-            return pickle.load(f)
+        return get_model()
     except Exception as e:
         st.error(f"Error loading model: {str(e)}")
         return None
 
 
+@st.cache_resource
+def get_batcher():
+    # Shared by every session so concurrent chats are scored together
+    from explain import predict_explained_versioned
+    from micro_batcher import MicroBatcher
+
+    if load_model() is None:
+        return None
+    return MicroBatcher(predict_explained_versioned)
 
 
 def get_loan_eligibility(person_age, person_income, person_home_ownership, person_emp_length,
                         loan_intent, loan_grade, loan_amnt, loan_int_rate,
                         cb_person_default_on_file, cb_person_cred_hist_length):
+    # The scoring stack (pandas, sklearn, lightgbm) loads with the first assessment
+    from explain import summarize
+    from score_cache import predict_cached
+
     try:
-        model = load_model()
-        if model is None:
+        batcher = get_batcher()
+        if batcher is None:
             return {"error": "Model loading failed"}
         
-        user_input = pd.DataFrame([{
+        user_input = {
             'person_age': person_age,
             'person_income': person_income,
             'person_home_ownership': person_home_ownership,
@@ -49,22 +65,90 @@ def get_loan_eligibility(person_age, person_income, person_home_ownership, perso
             'loan_int_rate': loan_int_rate,
             'cb_person_default_on_file': cb_person_default_on_file,
             'cb_person_cred_hist_length': cb_person_cred_hist_length,
-        }])
+        }
+        errors = validate_row(user_input)
+        if errors:
+            ERRORS.inc(endpoint='chatbot', kind='validation')
+            return {"error": "Invalid applicant details: " + "; ".join(errors)}
         
-        prediction = model.predict(user_input)[0]
+        with stage("score"):
+            (probability, contributions), version = predict_cached(user_input, batcher.predict)
+        decision = current_policy().decide(probability, loan_intent)
+        record(new_request_id(), "chatbot", version, probability, decision, user_input)
+        record_decisions(version, [decision["decision"]])
+        observe(user_input)
         
         result = {
-            "default_risk": bool(prediction),
-            "input_data": user_input.to_dict(orient='records')[0],
-            "message": "High default risk" if prediction else "Low default risk"
+            "default_risk": bool(model_label(probability)),
+            "probability": probability,
+            **decision,
+            "explanation": contributions,
+            "factors": summarize(contributions, user_input),
+            "input_data": user_input,
+            "model_version": version,
+            "message": {
+                AUTO_APPROVE: "Low default risk, approved automatically",
+                DECLINE: "High default risk, declined",
+            }.get(decision["decision"], "Moderate default risk, referred for manual review")
         }
         
         return result
+    except AuditBacklog as e:
+        ERRORS.inc(endpoint='chatbot', kind='audit')
+        return {"error": f"The decision could not be recorded, please retry shortly: {e}"}
     except Exception as e:
+        ERRORS.inc(endpoint='chatbot', kind='scoring')
         return {"error": f"Failed to process loan eligibility: {str(e)}"}
 
 
 
+def show_assessment(function_args):
+    # Get prediction
+    function_response = get_loan_eligibility(**function_args)
+
+    if "error" not in function_response:
+        factors = textwrap.indent(function_response["factors"], " " * 8)
+        result_message = f"""
+        📊 Risk Assessment Results
+        {"⚠️ High Default Risk" if function_response["default_risk"] else "✅ Low Default Risk"}
+
+        Default probability: {function_response['probability']:.1%} · Risk grade: {function_response['risk_grade']} · Decision: {function_response['decision'].replace('_', ' ').title()}
+
+        ### **Personal Details:**
+        - Age: {function_args['person_age']} years
+        - Income: ${function_args['person_income']:,}
+        - Home Ownership: {function_args['person_home_ownership']}
+        - Employment Length: {function_args['person_emp_length']} years
+
+        ### **Loan Details:**
+        - Loan Amount: ${function_args['loan_amnt']:,}
+        - Interest Rate: {function_args['loan_int_rate']}%
+        - Loan Purpose: {function_args['loan_intent']}
+        - Loan Grade: {function_args['loan_grade']}
+
+        ### **Credit Details:**
+        - Credit Default on File: {'Yes' if function_args['cb_person_default_on_file'] == 'Y' else 'No'}
+        - Credit History Length: {function_args['cb_person_cred_hist_length']} years
+
+        ### **Key Factors:**
+{factors}
+        """
+        follow_up = (f"{function_response['message']}. The key factors are the model's own feature "
+                     "contributions for this applicant. Would you like to start a new assessment? (yes/no)")
+    else:
+        result_message = f"⚠️ Error: {function_response['error']}"
+        follow_up = "Would you like to start a new assessment? (yes/no)"
+
+    # The factors come from the model, so no second LLM round trip is needed to explain them
+    st.session_state.messages.append({"role": "assistant", "content": result_message})
+    st.session_state.messages.append({"role": "assistant", "content": follow_up})
+
+    if "error" not in function_response and function_response["decision"] == AUTO_APPROVE:
+        st.balloons()
+    st.markdown(result_message)
+    st.markdown(follow_up)
+
+
 def reset_conversation_state():
    
     # Clear all conversation-related session state
@@ -120,149 +204,56 @@ def show():
             st.markdown(f'<div class="chat-message">{prompt.upper()}</div>', unsafe_allow_html=True)
 
 
-        # Define tools for the model
-        tools = [{
-            "type": "function",
-            "function": {
-                "name": "loan_eligibility",
-                "description": "Predict loan default risk using the trained model",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "person_age": {
-                            "type": "integer",
-                            "minimum": 18,
-                            "maximum": 100,
-                            "description": "Age of the applicant"
-                        },
-                        "person_income": {
-                            "type": "integer",
-                            "minimum": 0,
-                            "description": "Annual income of the applicant in dollars"
-                        },
-                        "person_home_ownership": {
-                            "type": "string",
-                            "enum": ["RENT", "MORTGAGE", "OWN", "OTHER"],
-                            "description": "Home ownership status"
-                        },
-                        "person_emp_length": {
-                            "type": "integer",
-                            "minimum": 0,
-                            "maximum": 50,
-                            "description": "Length of employment in years"
-                        },
-                        "loan_intent": {
-                            "type": "string",
-                            "enum": ["MEDICAL", "DEBTCONSOLIDATION", "HOMEIMPROVEMENT", "VENTURE", "PERSONAL", "EDUCATION"],
-                            "description": "Purpose of the loan"
-                        },
-                        "loan_grade": {
-                            "type": "string",
-                            "enum": ["A", "B", "C", "D", "E", "F", "G"],
-                            "description": "Grade of the loan"
-                        },
-                        "loan_amnt": {
-                            "type": "integer",
-                            "minimum": 0,
-                            "description": "loan amount in dollars"
-                        },
-                        "loan_int_rate": {
-                            "type": "number",
-                            "minimum": 0,
-                            "maximum": 30,
-                            "description": "Interest rate of the loan as a percentage"
-                        },
-                        "cb_person_default_on_file": {
-                            "type": "string",
-                            "enum": ["N", "Y"],
-                            "description": "Whether applicant has a default on file"
-                        },
-                        "cb_person_cred_hist_length": {
-                            "type": "integer",
-                            "minimum": 0,
-                            "maximum": 60,
-                            "description": "Length of credit history in years"
-                        }
-                    },
-                    "required": ["person_age", "person_income", "person_home_ownership", 
-                               "person_emp_length", "loan_intent", "loan_grade", "loan_amnt",
-                               "loan_int_rate", "cb_person_default_on_file", "cb_person_cred_hist_length"]
-                }
-            }
-        }]
+        # Plain answers to the intake questions are handled locally; only
+        # free text, corrections and the final explanation reach the LLM
+        step, action, reply = advance(st.session_state.current_step, st.session_state.collected_data, prompt)
+        st.session_state.current_step = step
 
         with st.chat_message("assistant"):
             with st.spinner("Analysing..."):
                 try:
-                    # Get initial response from the model
-                    response = client.chat.completions.create(
-                        model=MODEL,
-                        messages=[{"role": m["role"], "content": m["content"]} for m in st.session_state.messages],
-                        stream=False,
-                        tools=tools,
-                        tool_choice="auto",
-                        max_tokens=4096,
-                    )
-
-                    response_message = response.choices[0].message
-                    tool_calls = response_message.tool_calls
-
-                    # Handle tool calls (loan eligibility prediction)
-                    if tool_calls:
-                        for tool_call in tool_calls:
-                            if tool_call.function.name == "loan_eligibility":
-                                function_args = json.loads(tool_call.function.arguments)
-                                
-                                # Store the collected data
-                                st.session_state.collected_data = function_args
-                                
-                                # Get prediction
-                                function_response = get_loan_eligibility(**function_args)
-
-                                if "error" not in function_response:
-                                    if function_response["default_risk"] == False :
-                                        st.balloons()
-                                    result_message = f"""
-        
-                                    
-                                    📊 Risk Assessment Results
-                                    {"⚠️ High Default Risk" if function_response["default_risk"] else "✅ Low Default Risk"}
-                                
-
-                                    ### **Personal Details:**
-                                    - Age: {function_args['person_age']} years
-                                    - Income: ${function_args['person_income']:,}
-                                    - Home Ownership: {function_args['person_home_ownership']}
-                                    - Employment Length: {function_args['person_emp_length']} years
-
-                                    ### **Loan Details:**
-                                    - Loan Amount: ${function_args['loan_amnt']:,}
-                                    - Interest Rate: {function_args['loan_int_rate']}%
-                                    - Loan Purpose: {function_args['loan_intent']}
-                                    - Loan Grade: {function_args['loan_grade']}
-
-                                    ### **Credit Details:**
-                                    - Credit Default on File: {'Yes' if function_args['cb_person_default_on_file'] == 'Y' else 'No'}
-                                    - Credit History Length: {function_args['cb_person_cred_hist_length']} years
-                                    """
-                    
-                                else:
-                                    result_message = f"⚠️ Error: {function_response['error']}"
-
-                                st.markdown(result_message)
-                                st.session_state.messages.append({"role": "assistant", "content": result_message})
-
-                                # Get final response
-                                second_response = client.chat.completions.create(
-                                    model=MODEL,
-                                    messages=[*st.session_state.messages]
-                                )
-                                final_response = second_response.choices[0].message.content
-                                st.write(final_response)
-                                st.session_state.messages.append({"role": "assistant", "content": final_response})
+                    if action == "reply":
+                        st.markdown(reply)
+                        st.session_state.messages.append({"role": "assistant", "content": reply})
+                    elif action == "score":
+                        show_assessment(dict(st.session_state.collected_data))
                     else:
-                        st.write(response_message.content)
-                        st.session_state.messages.append({"role": "assistant", "content": response_message.content})
+                        # Stream the first reply; tool calls are collected alongside the text.
+                        # Only the system prompt, a state summary and recent turns are sent.
+                        response = get_client().stream(
+                            MODEL,
+                            compact_messages(st.session_state.messages, st.session_state.collected_data,
+                                             step=st.session_state.current_step),
+                            tools=TOOLS,
+                            tool_choice="auto",
+                            max_tokens=4096,
+                        )
+                        content = st.write_stream(response)
+                        tool_calls = response.tool_calls
+
+                        # Handle tool calls (loan eligibility prediction)
+                        if tool_calls:
+                            for tool_call in tool_calls:
+                                if tool_call["name"] == "loan_eligibility":
+                                    function_args = json.loads(tool_call["arguments"] or "{}")
+                                    errors = validate_row(function_args)
+                                    if errors:
+                                        # Model output is checked like any other input
+                                        message = ("Some details need correcting before I can assess the risk: "
+                                                   + "; ".join(errors))
+                                        st.markdown(message)
+                                        st.session_state.messages.append({"role": "assistant", "content": message})
+                                        continue
+                                    function_args = {field: function_args.get(field) for field in FIELD_ORDER}
+
+                                    # What the LLM extracted is confirmed by the user before it is scored
+                                    st.session_state.collected_data = function_args
+                                    st.session_state.current_step = CONFIRM
+                                    message = confirmation(function_args)
+                                    st.markdown(message)
+                                    st.session_state.messages.append({"role": "assistant", "content": message})
+                        else:
+                            st.session_state.messages.append({"role": "assistant", "content": content})
 
                 except Exception as e:
                     error_message = f"Sorry, I encountered an error: {str(e)}"
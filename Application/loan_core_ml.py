@@ -1,13 +1,15 @@
 import streamlit as st
-import pandas as pd
-import pickle
 from styles import core_ml_apply_styles
-import os
+from loan_schema import FIELDS, validate_row
+from audit_log import AuditBacklog, new_request_id, record
+from drift import observe
+from metrics import ERRORS, record_decisions, stage
+from model_registry import get_model, model_available
+from risk_policy import AUTO_APPROVE, MANUAL_REVIEW, current_policy
 def load_model():
     try:
-        current_dir = os.path.dirname(__file__)  # directory of loan_core_ml.py
-        model_path = os.path.join(current_dir, "Model_pipeline.pkl")
-        return pickle.load(open(model_path, 'rb'))
+        # Shared process-wide, so reruns never unpickle the model again
+        return get_model()
     except FileNotFoundError:
         st.error("❌ Model file not found. Please ensure 'Model_pipeline.pkl' is in the same folder as 'loan_core_ml.py'.")
         return None
@@ -24,7 +26,8 @@ def show():
     """)
     st.markdown('</div>', unsafe_allow_html=True)
     
-    model = load_model()
+    # The model itself loads on the first assessment, so the form paints without it
+    model = model_available()
     
     if not model:
         st.error("Risk assessment model not loaded. Please check the model file.")
@@ -36,88 +39,111 @@ def show():
         with col1:
             person_age = st.number_input(
                 "Age", 
-                min_value=18, 
-                max_value=100, 
+                min_value=FIELDS["person_age"]["minimum"], 
+                max_value=FIELDS["person_age"]["maximum"], 
                 value=30,
                 help="Applicant's current age"
             )
             home_ownership = st.selectbox(
                 "Home Ownership Status", 
-                ["RENT", "MORTGAGE", "OWN", "OTHER"],
+                FIELDS["person_home_ownership"]["enum"],
                 help="Current housing situation"
             )
             loan_amnt = st.number_input(
                 "Requested Loan Amount ($)", 
-                min_value=0, 
+                min_value=FIELDS["loan_amnt"]["minimum"], 
                 value=10000, 
                 step=500,
                 help="Amount of loan requested"
             )
             loan_intent = st.selectbox(
                 "Loan Purpose", 
-                ["MEDICAL", "DEBTCONSOLIDATION", "HOMEIMPROVEMENT", "VENTURE", "PERSONAL", "EDUCATION"],
+                FIELDS["loan_intent"]["enum"],
                 help="Primary purpose for the loan"
             )
             cb_person_cred_hist_length = st.number_input(
                 "Credit History Length (years)", 
-                min_value=0, 
+                min_value=FIELDS["cb_person_cred_hist_length"]["minimum"], 
                 value=10, 
-                max_value=60,
+                max_value=FIELDS["cb_person_cred_hist_length"]["maximum"],
                 help="Length of credit history in years"
             )
         
         with col2:
             person_income = st.number_input(
                 "Annual Income ($)", 
-                min_value=0, 
+                min_value=FIELDS["person_income"]["minimum"], 
                 value=50000, 
                 step=1000,
                 help="Applicant's annual income before taxes"
             )
             person_emp_length = st.number_input(
                 "Employment Length (years)", 
-                min_value=0, 
-                max_value=50, 
+                min_value=FIELDS["person_emp_length"]["minimum"], 
+                max_value=FIELDS["person_emp_length"]["maximum"], 
                 value=5,
                 help="Years at current employment"
             )
             loan_int_rate = st.slider(
                 "Interest Rate (%)", 
-                min_value=0.0, 
-                max_value=30.0, 
+                min_value=float(FIELDS["loan_int_rate"]["minimum"]), 
+                max_value=float(FIELDS["loan_int_rate"]["maximum"]), 
                 value=5.0, 
                 step=0.1,
                 help="Annual interest rate for the loan"
             )
             loan_grade = st.selectbox(
                 "Loan Grade", 
-                ["A", "B", "C", "D", "E", "F", "G"],
+                FIELDS["loan_grade"]["enum"],
                 help="Loan grade based on credit assessment"
             )
             cb_person_default_on_file = st.selectbox(
                 "Previous Defaults", 
-                ["N", "Y"],
+                FIELDS["cb_person_default_on_file"]["enum"],
                 help="Whether the applicant has defaulted on previous loans"
             )
         
+        user_input = {
+            'person_age': person_age,
+            'person_income': person_income,
+            'person_home_ownership': home_ownership,
+            'person_emp_length': person_emp_length,
+            'loan_intent': loan_intent,
+            'loan_grade': loan_grade,
+            'loan_amnt': loan_amnt,
+            'loan_int_rate': loan_int_rate,
+            'cb_person_default_on_file': cb_person_default_on_file,
+            'cb_person_cred_hist_length': cb_person_cred_hist_length,
+        }
+
         if st.button("Analyze Default Risk"):
+            errors = validate_row(user_input)
+            if errors:
+                ERRORS.inc(endpoint='streamlit_form', kind='validation')
+                st.error("Please correct the applicant details: " + "; ".join(errors))
+                return
+            if load_model() is None:
+                return
+            import pandas as pd
+            from explain import predict_explained_versioned, summarize
+            from score_cache import predict_cached
+
             try:
-                user_input = pd.DataFrame([{
-                    'person_age': person_age,
-                    'person_income': person_income,
-                    'person_home_ownership': home_ownership,
-                    'person_emp_length': person_emp_length,
-                    'loan_intent': loan_intent,
-                    'loan_grade': loan_grade,
-                    'loan_amnt': loan_amnt,
-                    'loan_int_rate': loan_int_rate,
-                    'cb_person_default_on_file': cb_person_default_on_file,
-                    'cb_person_cred_hist_length': cb_person_cred_hist_length,
-                }])
-                
-                prediction = model.predict(user_input)[0]
+                # Re-clicks with unchanged inputs are served from the shared cache
+                with stage("score"):
+                    (probability, contributions), version = predict_cached(
+                        user_input, lambda row: predict_explained_versioned(pd.DataFrame([row]))[0]
+                    )
+                decision = current_policy().decide(probability, loan_intent)
+                record(new_request_id(), "streamlit_form", version, probability, decision, user_input)
+                record_decisions(version, [decision["decision"]])
+                observe(user_input)
+                st.caption(
+                    f"Default probability {probability:.1%} · risk grade {decision['risk_grade']} · "
+                    f"model version {version} · policy {decision['policy']}"
+                )
                 
-                if prediction == 0:
+                if decision["decision"] == AUTO_APPROVE:
                     st.balloons()  # Show a celebratory animation
                     st.success("✅ Low Default Risk: The applicant shows good indicators for loan repayment.")
                     st.markdown(
@@ -130,6 +156,8 @@ def show():
                         """, 
                         unsafe_allow_html=True
                     )
+                elif decision["decision"] == MANUAL_REVIEW:
+                    st.info("🔎 Manual Review: The applicant falls between the auto-approve and decline thresholds.")
                 else:
                     st.warning("⚠️ High Default Risk: The applicant shows elevated risk indicators for default.")
                     st.markdown(
@@ -142,5 +170,78 @@ def show():
                         """, 
                         unsafe_allow_html=True
                     )
+                st.markdown("**Key factors**\n\n" + summarize(contributions, user_input))
+            except AuditBacklog as e:
+                ERRORS.inc(endpoint='streamlit_form', kind='audit')
+                st.error(f"The decision could not be recorded, please retry shortly: {e}")
             except Exception as e:
+                ERRORS.inc(endpoint='streamlit_form', kind='scoring')
                 st.error(f"Error during risk assessment: {e}")
+
+        with st.expander("🔀 What-if: loan amount and interest rate"):
+            show_what_if(user_input)
+
+
+def what_if_chart(result, applicant):
+    # Heatmap of the default probability with the approval boundary on top
+    import altair as alt
+    import pandas as pd
+
+    amounts, rates = result["axes"]["loan_amnt"], result["axes"]["loan_int_rate"]
+    amount_step, rate_step = amounts[1] - amounts[0], rates[1] - rates[0]
+    cells = pd.DataFrame(
+        [(a, r, p, d) for a, row, decisions in zip(amounts, result["probabilities"], result["decisions"])
+         for r, p, d in zip(rates, row, decisions)],
+        columns=["loan_amnt", "loan_int_rate", "probability", "decision"],
+    )
+    cells["amnt_from"], cells["amnt_to"] = cells["loan_amnt"] - amount_step / 2, cells["loan_amnt"] + amount_step / 2
+    cells["rate_from"], cells["rate_to"] = cells["loan_int_rate"] - rate_step / 2, cells["loan_int_rate"] + rate_step / 2
+
+    surface = alt.Chart(cells).mark_rect().encode(
+        x=alt.X("amnt_from:Q", title="Loan amount ($)"), x2="amnt_to",
+        y=alt.Y("rate_from:Q", title="Interest rate (%)"), y2="rate_to",
+        color=alt.Color("probability:Q", title="Default probability", scale=alt.Scale(scheme="redyellowgreen", reverse=True)),
+        tooltip=["loan_amnt", "loan_int_rate", alt.Tooltip("probability:Q", format=".1%"), "decision"],
+    )
+    layers = [surface]
+    if result["boundary"]:
+        layers.append(alt.Chart(pd.DataFrame(result["boundary"])).mark_circle(color="black", size=18).encode(
+            x="loan_amnt:Q", y="loan_int_rate:Q"))
+    layers.append(alt.Chart(pd.DataFrame([applicant])).mark_point(color="blue", size=120, filled=True).encode(
+        x="loan_amnt:Q", y="loan_int_rate:Q"))
+    return alt.layer(*layers)
+
+
+def show_what_if(applicant):
+    col1, col2 = st.columns(2)
+    with col1:
+        amount_range = st.slider("Loan amount range ($)", 500, 35000, (500, 35000), step=500)
+    with col2:
+        rate_range = st.slider("Interest rate range (%)", 0.0, 30.0, (5.0, 23.0), step=0.5)
+
+    if st.button("Run What-if Sweep"):
+        from what_if import sweep
+
+        try:
+            # Every grid point is scored in one vectorized model call
+            result = sweep(applicant, {
+                "loan_amnt": {"min": amount_range[0], "max": amount_range[1], "steps": 40},
+                "loan_int_rate": {"min": rate_range[0], "max": rate_range[1], "steps": 30},
+            })
+        except ValueError as e:
+            st.error(f"Invalid sweep: {e}")
+            return
+
+        st.altair_chart(what_if_chart(result, applicant))
+        st.caption(
+            f"{result['points']:,} scenarios scored · auto-approve below {result['approve_below']:.0%} "
+            f"default probability · black dots mark the approval boundary, blue the current application"
+        )
+        nearest = result["nearest_approval"]
+        if nearest is None:
+            st.warning("No loan amount and interest rate in this range is approved automatically.")
+        else:
+            st.success(
+                f"Nearest auto-approved scenario: loan amount ${nearest['loan_amnt']:,.0f} at "
+                f"{nearest['loan_int_rate']:.1f}% ({nearest['probability']:.1%} default probability)"
+            )
@@ -0,0 +1,201 @@
+# Applicant schema shared by the chatbot tool definition, the local intake,
+# the Streamlit form and the Flask API. Built and compiled into the
+# validators below once at import time rather than on every request.
+# Only the column-wise batch checks need numpy and pandas, so they import
+# them on first use and the pages that validate single rows stay light.
+import math
+
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "loan_eligibility",
+        "description": "Predict loan default risk using the trained model",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "person_age": {
+                    "type": "integer",
+                    "minimum": 18,
+                    "maximum": 100,
+                    "description": "Age of the applicant"
+                },
+                "person_income": {
+                    "type": "integer",
+                    "minimum": 0,
+                    "description": "Annual income of the applicant in dollars"
+                },
+                "person_home_ownership": {
+                    "type": "string",
+                    "enum": ["RENT", "MORTGAGE", "OWN", "OTHER"],
+                    "description": "Home ownership status"
+                },
+                "person_emp_length": {
+                    "type": "integer",
+                    "minimum": 0,
+                    "maximum": 50,
+                    "description": "Length of employment in years"
+                },
+                "loan_intent": {
+                    "type": "string",
+                    "enum": ["MEDICAL", "DEBTCONSOLIDATION", "HOMEIMPROVEMENT", "VENTURE", "PERSONAL", "EDUCATION"],
+                    "description": "Purpose of the loan"
+                },
+                "loan_grade": {
+                    "type": "string",
+                    "enum": ["A", "B", "C", "D", "E", "F", "G"],
+                    "description": "Grade of the loan"
+                },
+                "loan_amnt": {
+                    "type": "integer",
+                    "minimum": 0,
+                    "description": "loan amount in dollars"
+                },
+                "loan_int_rate": {
+                    "type": "number",
+                    "minimum": 0,
+                    "maximum": 30,
+                    "description": "Interest rate of the loan as a percentage"
+                },
+                "cb_person_default_on_file": {
+                    "type": "string",
+                    "enum": ["N", "Y"],
+                    "description": "Whether applicant has a default on file"
+                },
+                "cb_person_cred_hist_length": {
+                    "type": "integer",
+                    "minimum": 0,
+                    "maximum": 60,
+                    "description": "Length of credit history in years"
+                }
+            },
+            "required": ["person_age", "person_income", "person_home_ownership", 
+                         "person_emp_length", "loan_intent", "loan_grade", "loan_amnt",
+                         "loan_int_rate", "cb_person_default_on_file", "cb_person_cred_hist_length"]
+        }
+    }
+}]
+
+PARAMETERS = TOOLS[0]["function"]["parameters"]
+FIELDS = PARAMETERS["properties"]
+# Order in which the intake asks for the fields
+FIELD_ORDER = PARAMETERS["required"]
+NUMERIC_FIELDS = [field for field in FIELD_ORDER if "enum" not in FIELDS[field]]
+# The pipeline imputes these, so the API accepts them as null
+NULLABLE = {"person_emp_length", "loan_int_rate"}
+
+FIELD_LABELS = {
+    "person_age": "Age",
+    "person_income": "Annual income",
+    "person_home_ownership": "Home ownership",
+    "person_emp_length": "Employment length",
+    "loan_intent": "Loan purpose",
+    "loan_grade": "Loan grade",
+    "loan_amnt": "Loan amount",
+    "loan_int_rate": "Interest rate",
+    "cb_person_default_on_file": "Previous default",
+    "cb_person_cred_hist_length": "Credit history length",
+}
+
+
+class _Rule:
+    # One field's checks, precomputed from its JSON schema entry
+    def __init__(self, field, spec):
+        self.field = field
+        self.nullable = field in NULLABLE
+        self.enum = frozenset(spec.get("enum", ()))
+        self.enum_message = f"{field} must be one of {spec.get('enum')}"
+        self.integer = spec.get("type") == "integer"
+        self.minimum = spec.get("minimum", -math.inf)
+        self.maximum = spec.get("maximum", math.inf)
+        self.range_message = f"{field} must be between {spec.get('minimum', '-inf')} and {spec.get('maximum', 'inf')}"
+
+    def check(self, value):
+        if value is None or isinstance(value, float) and math.isnan(value):
+            return None if self.nullable else f"{self.field} is required"
+        if self.enum:
+            # Lists and objects are not hashable, so they are rejected before the lookup
+            return None if isinstance(value, str) and value in self.enum else self.enum_message
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or math.isinf(value):
+            return f"{self.field} must be a number"
+        if self.integer and value != int(value):
+            return f"{self.field} must be a whole number"
+        if not self.minimum <= value <= self.maximum:
+            return self.range_message
+        return None
+
+    def check_column(self, column):
+        """Returns (bad row mask, message per bad row) for one DataFrame column."""
+        import numpy as np
+        import pandas as pd
+
+        missing = column.isna().to_numpy()
+        bad = np.zeros(len(column), dtype=bool) if self.nullable else missing.copy()
+        messages = np.full(len(column), f"{self.field} is required", dtype=object)
+        present = ~missing
+
+        if self.enum:
+            wrong = present & ~column.isin(self.enum).to_numpy()
+            messages[wrong] = self.enum_message
+            return bad | wrong, messages
+
+        if column.dtype == object:
+            # Mixed JSON values: strings and booleans are not numbers
+            wrong = present & ~column.map(
+                lambda v: isinstance(v, (int, float)) and not isinstance(v, bool)).to_numpy()
+        elif pd.api.types.is_bool_dtype(column) or not pd.api.types.is_numeric_dtype(column):
+            wrong = present
+        else:
+            wrong = np.zeros(len(column), dtype=bool)
+        values = pd.to_numeric(column.where(~wrong), errors="coerce").to_numpy(dtype=float)
+        wrong |= present & np.isinf(values)
+        messages[wrong] = f"{self.field} must be a number"
+        bad |= wrong
+
+        checked = present & ~wrong
+        if self.integer:
+            with np.errstate(invalid="ignore"):
+                fractional = checked & (values % 1 != 0)
+            messages[fractional] = f"{self.field} must be a whole number"
+            bad |= fractional
+            checked &= ~fractional
+        out_of_range = checked & ((values < self.minimum) | (values > self.maximum))
+        messages[out_of_range] = self.range_message
+        return bad | out_of_range, messages
+
+
+_RULES = [_Rule(field, FIELDS[field]) for field in FIELD_ORDER]
+
+
+def validate_row(row):
+    """Returns a list of problems with one applicant dict, empty when it can be scored."""
+    if not isinstance(row, dict):
+        return ["applicant must be a JSON object"]
+    errors = []
+    for rule in _RULES:
+        error = rule.check(row.get(rule.field))
+        if error is not None:
+            errors.append(error)
+    return errors
+
+
+def field_error(field, value):
+    """The problem with one field's value, or None; the message validate_row would give."""
+    return _RULES[FIELD_ORDER.index(field)].check(value)
+
+
+def validate_frame(frame):
+    """Column-wise `validate_row` for a DataFrame of applicants.
+
+    Returns {row position: [problems]} for the rows that cannot be scored.
+    """
+    import numpy as np
+
+    errors = {}
+    for rule in _RULES:
+        if rule.field not in frame:
+            bad, messages = np.ones(len(frame), dtype=bool), np.full(len(frame), f"{rule.field} is required")
+        else:
+            bad, messages = rule.check_column(frame[rule.field])
+        for position in np.flatnonzero(bad):
+            errors.setdefault(int(position), []).append(messages[position])
+    return errors
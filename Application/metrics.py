@@ -0,0 +1,303 @@
+"""Prometheus-style counters and latency histograms for the scoring path.
+
+Metrics live in the process that records them and render in the
+Prometheus text format (`render()`, served on the API's /metrics).
+`stage` times one step of scoring into `loan_stage_seconds`:
+
+    with stage("booster"):
+        raw = booster.predict(encoded)
+
+Pre-forked servers call `configure(directory)`: every process then writes
+its values to <directory>/<pid>.json once a second and `render()` adds the
+files up, so a scrape sees the whole server whichever worker answers it.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+FLUSH_SECONDS = 1.0
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_families = []
+_collectors = []
+_directory = None
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+class _Family:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _families.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), self._copy(value)] for key, value in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        _ensure_flusher()
+
+
+class Gauge(_Family):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+        _ensure_flusher()
+
+    def replace(self, value, **labels):
+        # Drops every other label set, e.g. the previous model version
+        key = self._key(labels)
+        with self._lock:
+            self._values = {key: value}
+        _ensure_flusher()
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (not cumulative), then the sum
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            entry[index] += 1
+            entry[-1] += value
+        _ensure_flusher()
+
+    def _copy(self, value):
+        return list(value)
+
+
+REQUESTS = Counter("loan_http_requests_total", "HTTP requests by endpoint and status code",
+                   ["endpoint", "status"])
+REQUEST_SECONDS = Histogram("loan_http_request_seconds", "HTTP request latency by endpoint", ["endpoint"])
+ERRORS = Counter("loan_errors_total", "Failed scoring requests by endpoint and kind", ["endpoint", "kind"])
+STAGE_SECONDS = Histogram("loan_stage_seconds", "Latency of each scoring stage", ["stage"])
+PREDICTIONS = Counter("loan_predictions_total", "Scored applicants by model version and decision",
+                      ["model_version", "decision"])
+MODEL_INFO = Gauge("loan_model_info", "Model version currently served", ["model_version"])
+AUDIT_RECORDS = Counter("loan_audit_records_total", "Audit records by outcome: queued, written, rejected or failed",
+                        ["outcome"])
+AUDIT_QUEUE = Gauge("loan_audit_queue", "Records waiting for the audit writer")
+FEATURE_PSI = Gauge("loan_feature_psi", "Population stability index of live applicants against the reference",
+                    ["feature"])
+FEATURE_KS = Gauge("loan_feature_ks", "Binned Kolmogorov-Smirnov distance of live applicants against the reference",
+                   ["feature"])
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+
+
+def record_decisions(version, decisions):
+    counts = {}
+    for decision in decisions:
+        counts[decision] = counts.get(decision, 0) + 1
+    for decision, count in counts.items():
+        PREDICTIONS.inc(count, model_version=version, decision=decision)
+
+
+def on_collect(callback):
+    """Runs `callback` before every flush or render, e.g. to refresh a gauge."""
+    _collectors.append(callback)
+
+
+def _run_collectors():
+    for callback in _collectors:
+        callback()
+
+
+def configure(directory):
+    """Shares metrics between processes through JSON files in `directory`."""
+    global _directory
+    os.makedirs(directory, exist_ok=True)
+    _directory = directory
+
+
+def clear_directory(directory):
+    # Stale files from an earlier server would otherwise be added to this one
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+def _ensure_flusher():
+    global _flusher
+    if _directory is None or _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_forever, name="metrics-flush", daemon=True)
+            _flusher.start()
+
+
+def _flush_forever():
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        flush()
+
+
+def flush():
+    if _directory is None:
+        return
+    _run_collectors()
+    state = {family.name: family.snapshot() for family in _families}
+    path = os.path.join(_directory, f"{os.getpid()}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def _reset_after_fork():
+    # A worker starts from zero; what the master recorded stays in its own file
+    global _flusher, _flusher_lock
+    _flusher = None
+    _flusher_lock = threading.Lock()
+    for family in _families:
+        family._lock = threading.Lock()
+        family.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _collect():
+    if _directory is None:
+        _run_collectors()
+        return {family.name: family.snapshot() for family in _families}
+
+    flush()
+    merged = {family.name: {} for family in _families}
+    kinds = {family.name: family.kind for family in _families}
+    for path in glob.glob(os.path.join(_directory, "*.json")):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        pid = int(os.path.basename(path).split(".")[0])
+        for name, entries in state.items():
+            # Counters and histograms of exited workers still count; gauges do not
+            if name not in merged or kinds[name] == "gauge" and not _alive(pid):
+                continue
+            for key, value in entries:
+                key = tuple(key)
+                previous = merged[name].get(key)
+                if previous is None:
+                    merged[name][key] = value
+                elif kinds[name] == "histogram":
+                    merged[name][key] = [a + b for a, b in zip(previous, value)]
+                elif kinds[name] == "counter":
+                    merged[name][key] = previous + value
+                else:
+                    merged[name][key] = max(previous, value)
+    return {name: [[list(key), value] for key, value in values.items()] for name, values in merged.items()}
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    state = _collect()
+    lines = []
+    for family in _families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for key, value in sorted(state[family.name]):
+            if family.kind != "histogram":
+                lines.append(f"{family.name}{_labels(family.labels, key)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(family.buckets) + ["+Inf"], value[:-1]):
+                cumulative += count
+                lines.append(f"{family.name}_bucket{_labels(family.labels, key, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{family.name}_sum{_labels(family.labels, key)} {value[-1]}")
+            lines.append(f"{family.name}_count{_labels(family.labels, key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_http_server(port, host="0.0.0.0"):
+    """Serves /metrics from a background thread, for processes without a web API (Streamlit)."""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
@@ -0,0 +1,131 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import pandas as pd
+
+from loan_schema import FIELD_ORDER
+from metrics import stage
+
+
+class Histogram:
+    # Fixed-bucket counter, each bucket counts observations <= its upper bound
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+
+    def snapshot(self):
+        with self._lock:
+            labels = [str(b) for b in self.bounds] + ["+Inf"]
+            return {
+                "buckets": [[label, count] for label, count in zip(labels, self.counts)],
+                "count": self.count,
+                "sum": self.total,
+            }
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predictions into one model call.
+
+    Rows submitted from different threads are collected until either
+    `max_batch` rows are waiting or `max_wait` seconds have passed since the
+    first one arrived, then scored together with `predict_fn`.
+    """
+
+    def __init__(self, predict_fn, max_wait=0.002, max_batch=64):
+        self.predict_fn = predict_fn
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.queue_depth = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        # Threads do not survive fork, a pre-forked worker starts its own
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, row):
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((row, future))
+        return future
+
+    def predict(self, row, timeout=None):
+        return self.submit(row).result(timeout=timeout)
+
+    def stats(self):
+        return {
+            "max_wait": self.max_wait,
+            "max_batch": self.max_batch,
+            "pending": self._queue.qsize(),
+            "queue_depth": self.queue_depth.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+        }
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        self.queue_depth.observe(self._queue.qsize() + 1)
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.batch_size.observe(len(batch))
+            self._score(batch)
+
+    def _score(self, batch):
+        try:
+            with stage("frame"):
+                # Fixed columns: nullable fields may be left out of a row, extra keys are dropped
+                frame = pd.DataFrame([row for row, _ in batch], columns=FIELD_ORDER)
+            results = self.predict_fn(frame)
+        except Exception:
+            # One bad row must not fail its neighbours, so fall back to scoring
+            # each row on its own and hand every caller its own outcome
+            for row, future in batch:
+                try:
+                    future.set_result(self.predict_fn(pd.DataFrame([row], columns=FIELD_ORDER))[0])
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,300 @@
+"""Process-wide model loading with a versioned, hot-reloadable registry.
+
+Models are published into a registry directory next to this module:
+
+    models/
+        manifest.json           # current version, sha256, metrics, feature schema
+        v1/Model_pipeline.pkl
+        v2/Model_pipeline.pkl
+
+Without a manifest the single Model_pipeline.pkl shipped with the app is
+served. When a manifest exists, a background thread polls it; a newly
+activated version is loaded, checked against its hash and feature schema,
+warmed on a few dataset rows and then swapped in with one assignment, so
+in-flight requests finish on the model they started with.
+
+    python model_registry.py publish --model path/to/pipeline.pkl --version v2 --metrics metrics.json
+    python model_registry.py activate v1
+    python model_registry.py list
+"""
+import argparse
+import gc
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import sys
+import threading
+import time
+from collections import namedtuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.environ.get("LOAN_MODEL_PATH", os.path.join(BASE_DIR, "Model_pipeline.pkl"))
+REGISTRY_DIR = os.environ.get("LOAN_MODEL_REGISTRY", os.path.join(BASE_DIR, "models"))
+DATASET_PATH = os.path.join(BASE_DIR, "..", "Dataset", "credit_risk_dataset.csv")
+MANIFEST_NAME = "manifest.json"
+ARTIFACT_NAME = "Model_pipeline.pkl"
+POLL_SECONDS = float(os.environ.get("LOAN_MODEL_POLL_SECONDS", 5))
+WARMUP_ROWS = 32
+
+logger = logging.getLogger(__name__)
+
+LoadedModel = namedtuple("LoadedModel", ["version", "model", "info"])
+
+_current = None
+_manifest_mtime = None
+_watcher = None
+_warm_versions = set()
+_lock = threading.Lock()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def feature_schema(model):
+    return [str(name) for name in model.feature_names_in_]
+
+
+def read_manifest(registry_dir=REGISTRY_DIR):
+    path = os.path.join(registry_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest, registry_dir):
+    # Written to a temp file and renamed so watchers never read half a manifest
+    path = os.path.join(registry_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _unpickle(path):
+    # sklearn comes in with the model, not with this module
+    from fast_imputer import serving_pipeline
+
+    with open(path, "rb") as f:
+        return serving_pipeline(pickle.load(f))
+
+
+def _load_version(manifest, version, registry_dir):
+    info = manifest["versions"][version]
+    path = os.path.join(registry_dir, info["file"])
+    if file_sha256(path) != info["sha256"]:
+        raise ValueError(f"Model {version} does not match its manifest hash")
+    model = _unpickle(path)
+    if feature_schema(model) != info["features"]:
+        raise ValueError(f"Model {version} does not match its manifest feature schema")
+    return LoadedModel(version, model, info)
+
+
+def _load_initial():
+    global _manifest_mtime
+    manifest_path = os.path.join(REGISTRY_DIR, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        _manifest_mtime = os.path.getmtime(manifest_path)
+        manifest = read_manifest()
+        return _load_version(manifest, manifest["current"], REGISTRY_DIR)
+
+    # No registry yet: serve the bundled pickle, versioned by its content hash
+    sha256 = file_sha256(MODEL_PATH)
+    model = _unpickle(MODEL_PATH)
+    info = {"file": MODEL_PATH, "sha256": sha256, "features": feature_schema(model)}
+    return LoadedModel(f"local-{sha256[:12]}", model, info)
+
+
+def warm_up(model, rows=WARMUP_ROWS):
+    # First predictions pay for lazy allocations, so spend them before serving
+    if not os.path.exists(DATASET_PATH):
+        return
+    import pandas as pd
+    sample = pd.read_csv(DATASET_PATH, nrows=rows)
+    model.predict(sample[model.feature_names_in_])
+
+
+def current():
+    # Loaded once per process on first use, then shared by every caller
+    global _current
+    if _current is None:
+        with _lock:
+            if _current is None:
+                _current = _load_initial()
+    start_watcher()
+    return _current
+
+
+def model_available():
+    # Whether there is a model to load, without loading it
+    return (_current is not None or os.path.exists(MODEL_PATH)
+            or os.path.exists(os.path.join(REGISTRY_DIR, MANIFEST_NAME)))
+
+
+def get_model():
+    return current().model
+
+
+def get_version():
+    return current().version
+
+
+def reload():
+    """Loads the manifest's current version if it changed; returns True on swap."""
+    global _current, _manifest_mtime
+    manifest_path = os.path.join(REGISTRY_DIR, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return False
+    mtime = os.path.getmtime(manifest_path)
+    if mtime == _manifest_mtime:
+        return False
+    _manifest_mtime = mtime
+
+    manifest = read_manifest()
+    active = _current
+    if active is not None and manifest["current"] == active.version:
+        return False
+
+    candidate = _load_version(manifest, manifest["current"], REGISTRY_DIR)
+    if active is not None and candidate.info["features"] != active.info["features"]:
+        raise ValueError(f"Model {candidate.version} expects a different feature schema")
+    warm_up(candidate.model)
+    _warm_versions.add(candidate.version)
+    with _lock:
+        _current = candidate
+    logger.info("Switched to model version %s", candidate.version)
+    return True
+
+
+def _watch():
+    while True:
+        time.sleep(POLL_SECONDS)
+        try:
+            reload()
+        except Exception:
+            # Keep serving the current model, retry on the next manifest change
+            logger.exception("Model reload failed")
+
+
+def start_watcher():
+    global _watcher
+    if _watcher is not None or POLL_SECONDS <= 0:
+        return
+    with _lock:
+        if _watcher is None:
+            _watcher = threading.Thread(target=_watch, name="model-watcher", daemon=True)
+            _watcher.start()
+
+
+def _reset_after_fork():
+    global _watcher, _lock
+    _watcher = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def ensure_warm():
+    """Loads and warms the current model if needed; returns its LoadedModel."""
+    loaded = current()
+    if loaded.version not in _warm_versions:
+        warm_up(loaded.model)
+        _warm_versions.add(loaded.version)
+    return loaded
+
+
+def is_warm():
+    # Cheap readiness check that never triggers a load
+    return _current is not None and _current.version in _warm_versions
+
+
+def preload():
+    # Call in a pre-fork server's master process. Freezing the collector keeps
+    # GC passes in the workers from writing to (and so copying) the model pages.
+    model = ensure_warm().model
+    gc.freeze()
+    return model
+
+
+def publish(model_path, version, metrics=None, registry_dir=REGISTRY_DIR, set_current=True):
+    manifest = read_manifest(registry_dir) or {"current": None, "versions": {}}
+    if version in manifest["versions"]:
+        raise ValueError(f"Model version {version} is already published")
+
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    version_dir = os.path.join(registry_dir, version)
+    os.makedirs(version_dir, exist_ok=True)
+    target = os.path.join(version_dir, ARTIFACT_NAME)
+    shutil.copyfile(model_path, target)
+
+    manifest["versions"][version] = {
+        "file": os.path.join(version, ARTIFACT_NAME),
+        "sha256": file_sha256(target),
+        "features": feature_schema(model),
+        "metrics": metrics or {},
+        "published_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    if set_current or manifest["current"] is None:
+        manifest["current"] = version
+    _write_manifest(manifest, registry_dir)
+    return manifest["versions"][version]
+
+
+def activate(version, registry_dir=REGISTRY_DIR):
+    manifest = read_manifest(registry_dir)
+    if manifest is None or version not in manifest["versions"]:
+        raise ValueError(f"Model version {version} is not published")
+    manifest["current"] = version
+    _write_manifest(manifest, registry_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the versioned model registry")
+    parser.add_argument("--registry", default=REGISTRY_DIR, help="registry directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    publish_cmd = commands.add_parser("publish", help="copy a pipeline pickle into the registry")
+    publish_cmd.add_argument("--model", required=True, help="pickled sklearn pipeline")
+    publish_cmd.add_argument("--version", required=True)
+    publish_cmd.add_argument("--metrics", help="JSON file with training metrics")
+    publish_cmd.add_argument("--no-activate", action="store_true", help="publish without serving it")
+
+    activate_cmd = commands.add_parser("activate", help="serve a published version")
+    activate_cmd.add_argument("version")
+
+    commands.add_parser("list", help="show published versions")
+    args = parser.parse_args(argv)
+
+    if args.command == "publish":
+        metrics = None
+        if args.metrics:
+            with open(args.metrics) as f:
+                metrics = json.load(f)
+        info = publish(args.model, args.version, metrics, args.registry, not args.no_activate)
+        print(f"Published {args.version} ({info['sha256'][:12]})")
+    elif args.command == "activate":
+        activate(args.version, args.registry)
+        print(f"Activated {args.version}")
+    else:
+        manifest = read_manifest(args.registry)
+        if manifest is None:
+            print(f"No registry at {args.registry}")
+            return 1
+        for version, info in manifest["versions"].items():
+            marker = "*" if version == manifest["current"] else " "
+            print(f"{marker} {version}  {info['sha256'][:12]}  {info['published_at']}  {info['metrics']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Maps default probabilities to lending decisions and risk grades.
+
+The model is scored once for a default probability. Approval cut-offs and
+risk bands live here, so trying a different policy is arithmetic on
+stored probabilities, not a re-score.
+
+A policy is a JSON file (LOAN_POLICY_PATH, default policy.json next to
+this module). Every key is optional:
+
+    {
+        "name": "2024-q3",
+        "approve_below": 0.15,
+        "decline_from": 0.5,
+        "intents": {"VENTURE": {"approve_below": 0.1, "decline_from": 0.4}},
+        "grades": [[0.05, "R1"], [0.1, "R2"], [0.2, "R3"], [0.35, "R4"], [0.5, "R5"], [null, "R6"]]
+    }
+
+Probabilities below `approve_below` are approved automatically, from
+`decline_from` on they are declined, and anything in between goes to
+manual review. The file is re-read when it changes.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+POLICY_PATH = os.environ.get("LOAN_POLICY_PATH", os.path.join(BASE_DIR, "policy.json"))
+
+AUTO_APPROVE, MANUAL_REVIEW, DECLINE = "auto_approve", "manual_review", "decline"
+DECISIONS = (AUTO_APPROVE, MANUAL_REVIEW, DECLINE)
+
+# Upper probability bound (exclusive) of each grade; None closes the scale
+DEFAULT_GRADES = [[0.05, "R1"], [0.1, "R2"], [0.2, "R3"], [0.35, "R4"], [0.5, "R5"], [None, "R6"]]
+
+# The pipeline's own predict() labels an applicant a defaulter above this
+MODEL_THRESHOLD = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+def model_label(probability):
+    # Same label as model.predict: argmax of [1 - p, p]
+    return int(probability > MODEL_THRESHOLD)
+
+
+class Policy:
+    def __init__(self, approve_below=0.2, decline_from=0.5, intents=None, grades=None, name="default"):
+        self.name = name
+        self.approve_below = approve_below
+        self.decline_from = decline_from
+        self.intents = {intent: (limits.get("approve_below", approve_below),
+                                 limits.get("decline_from", decline_from))
+                        for intent, limits in (intents or {}).items()}
+        grades = grades or DEFAULT_GRADES
+        self.grade_bounds = [bound for bound, _ in grades[:-1]]
+        self.grade_labels = [label for _, label in grades]
+
+        for low, high in [(approve_below, decline_from), *self.intents.values()]:
+            if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (low, high)):
+                raise ValueError(f"Policy {name}: thresholds must be numbers, got {low!r} and {high!r}")
+            if not 0 <= low <= high <= 1:
+                raise ValueError(f"Policy {name}: need 0 <= approve_below <= decline_from <= 1, "
+                                 f"got {low} and {high}")
+        if grades[-1][0] is not None or self.grade_bounds != sorted(self.grade_bounds):
+            raise ValueError(f"Policy {name}: grade bounds must increase and end with null")
+
+    @classmethod
+    def from_dict(cls, config):
+        # Shapes are checked here, values in __init__: a bad policy is a ValueError, never an AttributeError
+        if not isinstance(config, dict):
+            raise ValueError("policy must be an object")
+        intents = config.get("intents")
+        if intents is not None and (not isinstance(intents, dict)
+                                    or not all(isinstance(limits, dict) for limits in intents.values())):
+            raise ValueError("intent limits must be an object")
+        return cls(config.get("approve_below", 0.2), config.get("decline_from", 0.5),
+                   config.get("intents"), config.get("grades"), config.get("name", "default"))
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "approve_below": self.approve_below,
+            "decline_from": self.decline_from,
+            "intents": {intent: {"approve_below": low, "decline_from": high}
+                        for intent, (low, high) in self.intents.items()},
+            "grades": [[bound, label] for bound, label in
+                       zip(self.grade_bounds + [None], self.grade_labels)],
+        }
+
+    def thresholds(self, loan_intent):
+        return self.intents.get(loan_intent, (self.approve_below, self.decline_from))
+
+    def grade(self, probability):
+        return self.grade_labels[bisect.bisect_right(self.grade_bounds, probability)]
+
+    def decide(self, probability, loan_intent=None):
+        approve_below, decline_from = self.thresholds(loan_intent)
+        if probability < approve_below:
+            decision = AUTO_APPROVE
+        elif probability >= decline_from:
+            decision = DECLINE
+        else:
+            decision = MANUAL_REVIEW
+        return {"decision": decision, "risk_grade": self.grade(probability), "policy": self.name}
+
+    def decide_many(self, probabilities, loan_intents):
+        """Vectorized `decide`; returns (decisions, risk_grades) as arrays."""
+        # Imported here so single decisions (the Streamlit pages) do not load numpy
+        import numpy as np
+
+        probabilities = np.asarray(probabilities, dtype=float)
+        loan_intents = np.asarray(loan_intents, dtype=object)
+        approve_below = np.full(len(probabilities), self.approve_below)
+        decline_from = np.full(len(probabilities), self.decline_from)
+        for intent, (low, high) in self.intents.items():
+            match = loan_intents == intent
+            approve_below[match] = low
+            decline_from[match] = high
+
+        index = (probabilities >= approve_below).astype(int) + (probabilities >= decline_from)
+        decisions = np.array(DECISIONS, dtype=object)[index]
+        grades = np.array(self.grade_labels, dtype=object)[
+            np.searchsorted(self.grade_bounds, probabilities, side="right")]
+        return decisions, grades
+
+
+def load_policy(path=None):
+    path = path or POLICY_PATH
+    if not os.path.exists(path):
+        return Policy()
+    with open(path) as f:
+        return Policy.from_dict(json.load(f))
+
+
+_policy = None
+_policy_mtime = None
+_lock = threading.Lock()
+
+
+def current_policy():
+    # One stat per call; an edited policy file applies to the next decision
+    global _policy, _policy_mtime
+    mtime = os.path.getmtime(POLICY_PATH) if os.path.exists(POLICY_PATH) else None
+    if _policy is None or mtime != _policy_mtime:
+        with _lock:
+            if _policy is None or mtime != _policy_mtime:
+                try:
+                    _policy = load_policy()
+                except (ValueError, TypeError, KeyError):
+                    if _policy is None:
+                        raise
+                    # Keep deciding with the last good policy until the file is fixed
+                    logger.exception("Invalid policy file %s", POLICY_PATH)
+                _policy_mtime = mtime
+    return _policy
@@ -0,0 +1,113 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from loan_schema import FIELD_ORDER
+from model_registry import get_version
+
+
+def canonical_key(row, version):
+    # Numbers compare by value (30 == 30.0, NaN == None); strings stay exact
+    # because the one-hot encoder is case sensitive
+    values = []
+    for field in FIELD_ORDER:
+        value = row.get(field)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = None if math.isnan(value) else float(value)
+        values.append(value)
+    return (version, *values)
+
+
+class ScoreCache:
+    """Size-bounded LRU of scoring results with a per-entry time to live."""
+
+    def __init__(self, max_size=10000, ttl=600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        # A new model makes every stored result stale
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key):
+        with self._lock:
+            self._check_version(key[0])
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._check_version(key[0])
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "model_version": self._version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Shared by the Flask API and both Streamlit pages in this process
+cache = ScoreCache(
+    max_size=int(os.environ.get("SCORE_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("SCORE_CACHE_TTL", 600)),
+)
+
+
+def predict_cached(row, predict_fn):
+    """Returns ((probability, explanation), version) for one applicant dict, scoring only on a miss.
+
+    `predict_fn` takes the row and returns the same, like `MicroBatcher.predict`
+    over `explain.predict_explained_versioned`. Decisions are made from the
+    cached probability by `risk_policy`, so a policy change never needs a
+    re-score.
+    """
+    try:
+        key = canonical_key(row, get_version())
+        hash(key)
+    except (TypeError, AttributeError):
+        # Malformed input is not worth caching; let the model report the error
+        return predict_fn(row)
+
+    result = cache.get(key)
+    if result is None:
+        result = predict_fn(row)
+        cache.put(canonical_key(row, result[1]), result)
+    return result
@@ -0,0 +1,383 @@
+"""Reproducible training of the loan default pipeline.
+
+Replays Notebook/Credit_underwriting.ipynb as one command. It loads and
+cleans the dataset once, holds out the same stratified 20% test split,
+cross-validates the candidate models and refits the chosen one as a full
+pipeline (IterativeImputer -> StandardScaler and OneHotEncoder ->
+classifier). The result is published to the model registry with its
+metrics.
+
+The slow part of the old loop was refitting the ColumnTransformer, and
+with it the IterativeImputer, for every model and fold. Here each fold's
+preprocessor is fitted once and its encoded output cached on disk, keyed
+by the dataset hash, the split, the fold and the preprocessor parameters.
+Every candidate and every later run reuses it. Folds are preprocessed and
+candidate x fold fits run across a process pool.
+
+    python train.py                                   # CV every candidate, refit the best, publish
+    python train.py --candidates lightgbm random_forest --workers 4
+    python train.py --final lightgbm --version v3 --no-activate
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+from sklearn.impute import IterativeImputer
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from dataset import load, source_sha256, widen
+from model_registry import DATASET_PATH, REGISTRY_DIR, publish
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("LOAN_TRAIN_CACHE", os.path.join(BASE_DIR, ".train_cache"))
+TARGET = "loan_status"
+TEST_SIZE = 0.2
+SPLIT_SEED = 0
+MODEL_SEED = 42
+
+
+def _logistic_regression(seed):
+    from sklearn.linear_model import LogisticRegression
+    return LogisticRegression(random_state=seed)
+
+
+def _svc(seed):
+    from sklearn.svm import SVC
+    return SVC(random_state=seed)
+
+
+def _decision_tree(seed):
+    from sklearn.tree import DecisionTreeClassifier
+    return DecisionTreeClassifier(random_state=seed)
+
+
+def _random_forest(seed):
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(random_state=seed)
+
+
+def _gradient_boosting(seed):
+    from sklearn.ensemble import GradientBoostingClassifier
+    return GradientBoostingClassifier(random_state=seed)
+
+
+def _adaboost(seed):
+    from sklearn.ensemble import AdaBoostClassifier
+    return AdaBoostClassifier(random_state=seed)
+
+
+def _knn(seed):
+    from sklearn.neighbors import KNeighborsClassifier
+    return KNeighborsClassifier()
+
+
+def _naive_bayes(seed):
+    from sklearn.naive_bayes import GaussianNB
+    return GaussianNB()
+
+
+def _xgboost(seed):
+    from xgboost import XGBClassifier
+    return XGBClassifier(random_state=seed)
+
+
+def _lightgbm(seed):
+    from lightgbm import LGBMClassifier
+    return LGBMClassifier(random_state=seed, verbose=-1)
+
+
+def _catboost(seed):
+    from catboost import CatBoostClassifier
+    return CatBoostClassifier(silent=True, random_state=seed)
+
+
+# The notebook's model comparison. SVC is left out of the default run: it
+# scales quadratically with the rows and takes longer than the rest together.
+CANDIDATES = {
+    "logistic_regression": _logistic_regression,
+    "svc": _svc,
+    "decision_tree": _decision_tree,
+    "random_forest": _random_forest,
+    "gradient_boosting": _gradient_boosting,
+    "adaboost": _adaboost,
+    "knn": _knn,
+    "naive_bayes": _naive_bayes,
+    "xgboost": _xgboost,
+    "lightgbm": _lightgbm,
+    "catboost": _catboost,
+}
+DEFAULT_CANDIDATES = [name for name in CANDIDATES if name != "svc"]
+
+
+def available_candidates(names):
+    # xgboost and catboost are optional; skip them when they are not installed
+    available = []
+    for name in names:
+        try:
+            CANDIDATES[name](MODEL_SEED)
+        except ImportError as e:
+            print(f"skipping {name}: {e}", file=sys.stderr)
+            continue
+        available.append(name)
+    return available
+
+
+def load_dataset(path=DATASET_PATH):
+    """The notebook's cleaning and split: returns (X, y, X_test, y_test)."""
+    df = widen(load(path)).drop_duplicates()
+    X, X_test, y, y_test = train_test_split(df.drop(TARGET, axis=1), df[TARGET], random_state=SPLIT_SEED,
+                                            test_size=TEST_SIZE, stratify=df[TARGET], shuffle=True)
+    X = X.drop("loan_percent_income", axis=1)
+    X_test = X_test.drop("loan_percent_income", axis=1)
+
+    # Implausible ages and employment lengths are dropped from training only
+    X = X.loc[X["person_age"] < 80]
+    X = X.loc[(X["person_emp_length"] < 66) | X["person_emp_length"].isna()]
+    return X, y[X.index], X_test, y_test
+
+
+def _imputer(name):
+    # The regressors the notebook's grid tried inside IterativeImputer
+    if name == "linear_regression":
+        from sklearn.linear_model import LinearRegression
+        return IterativeImputer(estimator=LinearRegression())
+    if name == "knn":
+        from sklearn.neighbors import KNeighborsRegressor
+        return IterativeImputer(estimator=KNeighborsRegressor())
+    if name in (None, "bayesian_ridge"):
+        return IterativeImputer()
+    raise ValueError(f"Unknown imputer {name!r}")
+
+
+def build_preprocessor(X, imputer=None):
+    num_cols = [col for col in X if pd.api.types.is_numeric_dtype(X[col])]
+    cat_cols = [col for col in X if col not in num_cols]
+    num_pipe = Pipeline([("imputation", _imputer(imputer)), ("scaling", StandardScaler())])
+    cat_pipe = Pipeline([("onehot", OneHotEncoder(sparse_output=False, handle_unknown="ignore"))])
+    return ColumnTransformer(transformers=[("num", num_pipe, num_cols), ("cat", cat_pipe, cat_cols)],
+                             remainder="passthrough")
+
+
+def preprocessor_key(preprocessor):
+    params = preprocessor.get_params(deep=True)
+    return json.dumps({name: repr(value) for name, value in sorted(params.items())
+                       if name != "transformers"}, sort_keys=True)
+
+
+def fold_cache_dir(dataset_sha256, folds, fold, preprocessor, cache_dir=CACHE_DIR):
+    key = json.dumps([dataset_sha256, TEST_SIZE, SPLIT_SEED, folds, fold, preprocessor_key(preprocessor)])
+    return os.path.join(cache_dir, hashlib.sha256(key.encode()).hexdigest()[:16])
+
+
+def _preprocess_fold(preprocessor, X_train, y_train, X_valid, y_valid, path):
+    # Fit on the training part of the fold only, then cache both encoded halves
+    start = time.perf_counter()
+    X_train_encoded = preprocessor.fit_transform(X_train)
+    X_valid_encoded = preprocessor.transform(X_valid)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    for name, array in (("X_train", X_train_encoded), ("y_train", y_train), ("X_valid", X_valid_encoded),
+                        ("y_valid", y_valid)):
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(array))
+    os.replace(tmp_path, path)
+    return time.perf_counter() - start
+
+
+def prepare_folds(pool, X, y, folds=5, dataset_sha256=None, cache_dir=CACHE_DIR, imputer=None, only=None,
+                  log=print):
+    """Cache directories of the encoded folds, preprocessing the missing ones on the pool."""
+    dataset_sha256 = dataset_sha256 or source_sha256(DATASET_PATH)
+    preprocessor = build_preprocessor(X, imputer)
+    # Unshuffled, like cross_val_score(cv=5) in the notebook
+    splits = list(StratifiedKFold(n_splits=folds).split(X, y))
+    paths = [fold_cache_dir(dataset_sha256, folds, fold, preprocessor, cache_dir) for fold in range(folds)]
+    wanted = range(folds) if only is None else only
+    os.makedirs(cache_dir, exist_ok=True)
+
+    missing = {}
+    for fold in wanted:
+        if not os.path.isdir(paths[fold]):
+            train, valid = splits[fold]
+            missing[pool.submit(_preprocess_fold, build_preprocessor(X, imputer), X.iloc[train], y.iloc[train],
+                                X.iloc[valid], y.iloc[valid], paths[fold])] = fold
+    for future, fold in missing.items():
+        log(f"fold {fold}{f' ({imputer} imputer)' if imputer else ''}: preprocessed in {future.result():.1f}s")
+    if len(missing) < len(wanted):
+        log(f"{len(wanted) - len(missing)} of {len(wanted)} folds from the preprocessing cache")
+    return paths
+
+
+def _single_threaded(model):
+    # One thread per task; the process pool is the parallelism
+    params = model.get_params()
+    for name in ("n_jobs", "thread_count"):
+        if name in params:
+            model.set_params(**{name: 1})
+    return model
+
+
+def _evaluate(name, fold, path, seed):
+    arrays = {part: np.load(os.path.join(path, f"{part}.npy"), mmap_mode="r")
+              for part in ("X_train", "y_train", "X_valid", "y_valid")}
+    start = time.perf_counter()
+    model = _single_threaded(CANDIDATES[name](seed))
+    model.fit(arrays["X_train"], arrays["y_train"])
+    predicted = model.predict(arrays["X_valid"])
+    scores = {"f1": f1_score(arrays["y_valid"], predicted)}
+    if hasattr(model, "predict_proba"):
+        scores["roc_auc"] = roc_auc_score(arrays["y_valid"], model.predict_proba(arrays["X_valid"])[:, 1])
+    scores["seconds"] = time.perf_counter() - start
+    return name, fold, scores
+
+
+def cross_validate(X, y, candidates, folds=5, workers=None, seed=MODEL_SEED, dataset_sha256=None,
+                   cache_dir=CACHE_DIR, log=print):
+    """Mean and per-fold F1 (and ROC AUC) of every candidate on cached fold encodings."""
+    results = {name: [None] * folds for name in candidates}
+    with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+        paths = prepare_folds(pool, X, y, folds, dataset_sha256, cache_dir, log=log)
+        tasks = [pool.submit(_evaluate, name, fold, paths[fold], seed)
+                 for name in candidates for fold in range(folds)]
+        for task in tasks:
+            name, fold, scores = task.result()
+            results[name][fold] = scores
+
+    summary = {}
+    for name, fold_scores in results.items():
+        f1 = [scores["f1"] for scores in fold_scores]
+        summary[name] = {"f1_mean": float(np.mean(f1)), "f1_std": float(np.std(f1)), "folds": fold_scores}
+        if all("roc_auc" in scores for scores in fold_scores):
+            summary[name]["roc_auc_mean"] = float(np.mean([scores["roc_auc"] for scores in fold_scores]))
+        log(f"{name:>20}: F1 {summary[name]['f1_mean']:.4f} ± {summary[name]['f1_std']:.4f} "
+            f"({sum(scores['seconds'] for scores in fold_scores):.1f}s)")
+    return summary
+
+
+def evaluate(model, X_test, y_test):
+    predicted = model.predict(X_test)
+    probabilities = model.predict_proba(X_test)[:, list(model.classes_).index(1)]
+    return {
+        "accuracy": float(accuracy_score(y_test, predicted)),
+        "f1": float(f1_score(y_test, predicted)),
+        "precision": float(precision_score(y_test, predicted)),
+        "recall": float(recall_score(y_test, predicted)),
+        "roc_auc": float(roc_auc_score(y_test, probabilities)),
+        "rows": int(len(y_test)),
+    }
+
+
+def fit_final(name, X, y, seed=MODEL_SEED, tuned=None):
+    imputer, model = None, CANDIDATES[name](seed)
+    if tuned is not None:
+        imputer = tuned.get("imputer")
+        model.set_params(**tuned["params"])
+    return Pipeline([("preprocessor", build_preprocessor(X, imputer)), ("model", model)]).fit(X, y)
+
+
+def library_versions():
+    import lightgbm
+    import sklearn
+    return {"python": sys.version.split()[0], "numpy": np.__version__, "pandas": pd.__version__,
+            "scikit-learn": sklearn.__version__, "lightgbm": lightgbm.__version__}
+
+
+def run(candidates=None, final=None, folds=5, workers=None, version=None, registry_dir=REGISTRY_DIR,
+        publish_model=True, activate=True, cache_dir=CACHE_DIR, tuned=None, log=print):
+    start = time.perf_counter()
+    dataset_sha256 = source_sha256(DATASET_PATH)
+    X, y, X_test, y_test = load_dataset()
+    log(f"{len(X):,} training rows, {len(X_test):,} held out, dataset {dataset_sha256[:12]}")
+
+    if tuned is not None:
+        # Parameters from tune.py; the comparison runs only if --candidates asks for it
+        final = tuned["model"]
+        candidates = available_candidates(candidates or [])
+    else:
+        candidates = available_candidates(candidates or DEFAULT_CANDIDATES)
+        if final is not None and final not in candidates:
+            candidates.append(final)
+    cv = {}
+    if candidates:
+        cv = cross_validate(X, y, candidates, folds, workers, MODEL_SEED, dataset_sha256, cache_dir, log)
+    final = final or max(cv, key=lambda name: cv[name]["f1_mean"])
+
+    model = fit_final(final, X, y, tuned=tuned)
+    test = evaluate(model, X_test, y_test)
+    log(f"{final} on the held-out split: " + ", ".join(f"{k} {v:.4f}" for k, v in test.items() if k != "rows"))
+
+    version = version or time.strftime("train-%Y%m%d-%H%M%S", time.gmtime())
+    build_dir = os.path.join(registry_dir, "build", version)
+    os.makedirs(build_dir, exist_ok=True)
+    model_path = os.path.join(build_dir, "Model_pipeline.pkl")
+    with open(model_path, "wb") as f:
+        pickle.dump(model, f)
+
+    report = {
+        "version": version,
+        "model": final,
+        "test": test,
+        "cv": cv,
+        "tuned": tuned,
+        "folds": folds,
+        "dataset_sha256": dataset_sha256,
+        "training_rows": int(len(X)),
+        "split": {"test_size": TEST_SIZE, "seed": SPLIT_SEED},
+        "model_seed": MODEL_SEED,
+        "libraries": library_versions(),
+        "train_seconds": time.perf_counter() - start,
+    }
+    with open(os.path.join(build_dir, "metrics.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    log(f"wrote {model_path} in {report['train_seconds']:.0f}s")
+
+    if publish_model:
+        # The manifest keeps the headline numbers; metrics.json has the full report
+        summary = {"model": final, **{f"test_{k}": v for k, v in test.items()}}
+        if tuned is not None:
+            summary["tuned_f1"] = tuned["f1"]
+        elif final in cv:
+            summary["cv_f1"] = cv[final]["f1_mean"]
+        info = publish(model_path, version, summary, registry_dir, set_current=activate)
+        shutil.copyfile(os.path.join(build_dir, "metrics.json"), os.path.join(registry_dir, version, "metrics.json"))
+        log(f"published {version} ({info['sha256'][:12]}){'' if activate else ', not activated'}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--candidates", nargs="+", choices=sorted(CANDIDATES), default=None,
+                        help="models to cross-validate (default: all but svc)")
+    parser.add_argument("--final", choices=sorted(CANDIDATES), help="model to ship (default: best CV F1)")
+    parser.add_argument("--params", help="ship the model and parameters found by tune.py (a JSON file)")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=0, help="processes (0 = one per core)")
+    parser.add_argument("--version", help="registry version (default: train-<UTC timestamp>)")
+    parser.add_argument("--registry", default=REGISTRY_DIR, help="registry directory")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="fold preprocessing cache")
+    parser.add_argument("--no-publish", action="store_true", help="only write the artifact and metrics")
+    parser.add_argument("--no-activate", action="store_true", help="publish without serving it")
+    args = parser.parse_args(argv)
+
+    tuned = None
+    if args.params:
+        with open(args.params) as f:
+            tuned = json.load(f)
+    run(args.candidates, args.final, args.folds, args.workers or None, args.version, args.registry,
+        not args.no_publish, not args.no_activate, args.cache_dir, tuned)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Hyperband search for the boosters' hyperparameters.
+
+The notebook's RandomizedSearchCV fitted 5 configurations with the full
+300-500 rounds on every fold. Here many more configurations start on a
+small budget and only the best third of each rung moves up
+(successive halving, eta=3). A budget of b trains on a stratified b
+share of the fold's rows with up to b * --max-rounds boosting rounds, and
+early stopping on the validation fold cuts the rounds short. Hyperband
+runs several such brackets, from many configurations on a tiny budget to
+a few on the full one.
+
+Fits run across a process pool on the cached fold encodings from
+train.py. Every result is appended to a journal, so an interrupted
+search picks up where it stopped. The best full-budget configuration is
+written as JSON for train.py --params.
+
+    python tune.py                               # LightGBM, full Hyperband
+    python tune.py --mode halving --min-budget 0.012 --workers 8
+    python train.py --params .train_cache/tuned_lightgbm.json --version v4
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from sklearn.metrics import f1_score, log_loss, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from dataset import source_sha256
+from model_registry import DATASET_PATH
+from train import CACHE_DIR, CANDIDATES, MODEL_SEED, available_candidates, load_dataset, prepare_folds
+
+# name -> ("log", low, high) | ("int", low, high) | ("uniform", low, high) | ("choice", options)
+SPACES = {
+    "lightgbm": {
+        "imputer": ("choice", ["bayesian_ridge", "linear_regression", "knn"]),
+        "learning_rate": ("log", 0.01, 0.3),
+        "num_leaves": ("int", 8, 128),
+        "max_depth": ("choice", [-1, 5, 7, 10, 15]),
+        "min_child_samples": ("int", 5, 100),
+        "subsample": ("uniform", 0.5, 1.0),
+        "colsample_bytree": ("uniform", 0.5, 1.0),
+        "reg_lambda": ("log", 1e-3, 10.0),
+        "class_weight": ("choice", [None, "balanced"]),
+    },
+    "catboost": {
+        "imputer": ("choice", ["bayesian_ridge", "linear_regression", "knn"]),
+        "learning_rate": ("log", 0.01, 0.3),
+        "depth": ("int", 4, 10),
+        "l2_leaf_reg": ("log", 1.0, 10.0),
+        "auto_class_weights": ("choice", [None, "Balanced"]),
+    },
+}
+# Set on every configuration; subsample has no effect in LightGBM without a bagging frequency
+FIXED = {"lightgbm": {"subsample_freq": 1}, "catboost": {}}
+
+
+def sample(space, rng):
+    config = {}
+    for name, (kind, *spec) in space.items():
+        if kind == "choice":
+            value = spec[0][rng.integers(len(spec[0]))]
+        elif kind == "log":
+            value = float(f"{math.exp(rng.uniform(math.log(spec[0]), math.log(spec[1]))):.4g}")
+        elif kind == "int":
+            value = int(round(math.exp(rng.uniform(math.log(spec[0]), math.log(spec[1])))))
+        else:
+            value = float(f"{rng.uniform(*spec):.4g}")
+        config[name] = value.item() if isinstance(value, np.generic) else value
+    return config
+
+
+def model_params(name, config, rounds=None):
+    params = {**FIXED[name], **{k: v for k, v in config.items() if k != "imputer"}}
+    if rounds is not None:
+        params["iterations" if name == "catboost" else "n_estimators"] = rounds
+    return params
+
+
+def _fit_budget(name, config, budget, path, max_rounds, patience, seed):
+    arrays = {part: np.load(os.path.join(path, f"{part}.npy"), mmap_mode="r")
+              for part in ("X_train", "y_train", "X_valid", "y_valid")}
+    start = time.perf_counter()
+    X_train, y_train = arrays["X_train"], np.asarray(arrays["y_train"])
+    if budget < 1:
+        rows, _ = train_test_split(np.arange(len(y_train)), train_size=budget, stratify=y_train, random_state=seed)
+        X_train, y_train = X_train[np.sort(rows)], y_train[np.sort(rows)]
+
+    rounds = max(int(max_rounds * budget), patience)
+    model = CANDIDATES[name](seed).set_params(**model_params(name, config, rounds))
+    if name == "catboost":
+        model.set_params(thread_count=1)
+        model.fit(X_train, y_train, eval_set=(arrays["X_valid"], arrays["y_valid"]), early_stopping_rounds=patience)
+        best_rounds = model.get_best_iteration() + 1
+    else:
+        import lightgbm
+        model.set_params(n_jobs=1)
+        model.fit(X_train, y_train, eval_set=[(arrays["X_valid"], arrays["y_valid"])],
+                  callbacks=[lightgbm.early_stopping(patience, verbose=False)])
+        best_rounds = model.best_iteration_ or rounds
+
+    probabilities = model.predict_proba(arrays["X_valid"])[:, 1]
+    return {
+        "f1": float(f1_score(arrays["y_valid"], probabilities > 0.5)),
+        "roc_auc": float(roc_auc_score(arrays["y_valid"], probabilities)),
+        "logloss": float(log_loss(arrays["y_valid"], probabilities)),
+        "rounds": int(best_rounds),
+        "rows": int(len(y_train)),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def read_journal(path):
+    results = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short when the last run was interrupted
+                results[entry["key"]] = entry
+    return results
+
+
+def journal_key(name, config, budget, path, max_rounds, patience, seed):
+    key = json.dumps([name, config, budget, os.path.basename(path), max_rounds, patience, seed], sort_keys=True)
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def brackets(eta, min_budget, mode):
+    """(configurations, starting budget) per bracket, most exploratory first."""
+    s_max = int(round(math.log(1 / min_budget, eta)))
+    if mode == "halving":
+        return [(eta ** s_max, eta ** -s_max)]
+    return [(math.ceil((s_max + 1) / (s + 1) * eta ** s), eta ** -s) for s in range(s_max, -1, -1)]
+
+
+def _rank(entry):
+    return -entry["f1"], entry["logloss"]
+
+
+def search(name="lightgbm", mode="hyperband", eta=3, min_budget=1 / 27, max_rounds=1000, patience=30, fold=0,
+           folds=5, workers=None, seed=MODEL_SEED, journal=None, cache_dir=CACHE_DIR, log=print):
+    """Run the search and return the best full-budget journal entry."""
+    start = time.perf_counter()
+    journal = journal or os.path.join(cache_dir, f"tune_{name}.jsonl")
+    done = read_journal(journal)
+    dataset_sha256 = source_sha256(DATASET_PATH)
+    X, y, _, _ = load_dataset()
+    rng = np.random.default_rng(seed)
+    plan = [(n, budget, [sample(SPACES[name], rng) for _ in range(n)]) for n, budget in brackets(eta, min_budget, mode)]
+    log(f"{mode}: {sum(n for n, _, _ in plan)} configurations in {len(plan)} bracket(s), "
+        f"{len(done)} results already in {journal}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(journal)), exist_ok=True)
+    fits, reused, full_budget = 0, 0, []
+    with ProcessPoolExecutor(workers or os.cpu_count()) as pool, open(journal, "a") as out:
+        paths = {imputer: prepare_folds(pool, X, y, folds, dataset_sha256, cache_dir, imputer, [fold], log)[fold]
+                 for imputer in sorted({config["imputer"] for _, _, configs in plan for config in configs})}
+
+        for bracket, (n, budget, configs) in enumerate(plan):
+            rung = 0
+            while configs:
+                rung_budget = min(round(budget * eta ** rung, 6), 1.0)
+                entries, pending = [], {}
+                for config in configs:
+                    path = paths[config["imputer"]]
+                    key = journal_key(name, config, rung_budget, path, max_rounds, patience, seed)
+                    if key in done:
+                        entries.append(done[key])
+                        reused += 1
+                    else:
+                        pending[pool.submit(_fit_budget, name, config, rung_budget, path, max_rounds, patience,
+                                            seed)] = (key, config)
+                for future in as_completed(pending):
+                    key, config = pending[future]
+                    entry = {"key": key, "model": name, "config": config, "budget": rung_budget, **future.result()}
+                    out.write(json.dumps(entry) + "\n")
+                    out.flush()
+                    done[key] = entry
+                    entries.append(entry)
+                    fits += 1
+
+                entries.sort(key=_rank)
+                log(f"bracket {bracket} rung {rung}: {len(entries)} x budget {rung_budget:.3f} "
+                    f"({entries[0]['rows']:,} rows, <= {max(int(max_rounds * rung_budget), patience)} rounds), "
+                    f"best F1 {entries[0]['f1']:.4f}")
+                if rung_budget >= 1.0:
+                    full_budget.extend(entries)
+                    break
+                configs = [entry["config"] for entry in entries[:max(len(entries) // eta, 1)]]
+                rung += 1
+
+    best = min(full_budget, key=_rank)
+    log(f"{fits} fits ({reused} from the journal) in {time.perf_counter() - start:.0f}s; "
+        f"best F1 {best['f1']:.4f}, ROC AUC {best['roc_auc']:.4f} after {best['rounds']} rounds: {best['config']}")
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", choices=sorted(SPACES), default="lightgbm")
+    parser.add_argument("--mode", choices=["hyperband", "halving"], default="hyperband",
+                        help="all brackets, or successive halving from --min-budget only")
+    parser.add_argument("--eta", type=int, default=3, help="keep 1/eta of each rung")
+    parser.add_argument("--min-budget", type=float, default=1 / 27, help="smallest share of rows and rounds")
+    parser.add_argument("--max-rounds", type=int, default=1000, help="boosting rounds at the full budget")
+    parser.add_argument("--patience", type=int, default=30, help="early stopping rounds")
+    parser.add_argument("--fold", type=int, default=0, help="CV fold used for validation")
+    parser.add_argument("--workers", type=int, default=0, help="processes (0 = one per core)")
+    parser.add_argument("--seed", type=int, default=MODEL_SEED)
+    parser.add_argument("--journal", help="results journal (default: <cache-dir>/tune_<model>.jsonl)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="fold preprocessing cache")
+    parser.add_argument("--output", help="best parameters (default: <cache-dir>/tuned_<model>.json)")
+    args = parser.parse_args(argv)
+
+    if not available_candidates([args.model]):
+        parser.error(f"{args.model} is not installed")
+    best = search(args.model, args.mode, args.eta, args.min_budget, args.max_rounds, args.patience, args.fold,
+                  workers=args.workers or None, seed=args.seed, journal=args.journal, cache_dir=args.cache_dir)
+    output = args.output or os.path.join(args.cache_dir, f"tuned_{args.model}.json")
+    with open(output, "w") as f:
+        json.dump({
+            "model": args.model,
+            "imputer": best["config"]["imputer"],
+            "params": model_params(args.model, best["config"], best["rounds"]),
+            "f1": best["f1"],
+            "roc_auc": best["roc_auc"],
+            "logloss": best["logloss"],
+            "fold": args.fold,
+            "seed": args.seed,
+        }, f, indent=2)
+    print(f"wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Prompt size and latency of a scripted chatbot intake, full history vs. compacted.
+
+Replays two back-to-back 10-field assessments against the local fake LLM
+backend and reports the prompt tokens sent per turn and the end-to-end
+latency of each completion.
+
+    python benchmarks/bench_chat_context.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Application"))
+
+from chat_context import compact_messages, prompt_tokens  # noqa: E402
+from chatbot_prompt import get_initial_messages  # noqa: E402
+from llm_client import ChatClient, FakeBackend  # noqa: E402
+
+APPLICANT = {
+    "person_age": 32,
+    "person_income": 58000,
+    "person_home_ownership": "RENT",
+    "person_emp_length": 6,
+    "loan_intent": "EDUCATION",
+    "loan_grade": "B",
+    "loan_amnt": 12000,
+    "loan_int_rate": 11.5,
+    "cb_person_default_on_file": "N",
+    "cb_person_cred_hist_length": 8,
+}
+
+QUESTIONS = [
+    "Thank you. What is the applicant's age? (Must be between 18 and 100 years)",
+    "Got it. What is the applicant's annual income in dollars?",
+    "Thanks. What is the home ownership status? (RENT/MORTGAGE/OWN/OTHER)",
+    "Noted. How many years has the applicant been employed? (0-50 years)",
+    "What is the purpose of the loan? (MEDICAL/DEBTCONSOLIDATION/HOMEIMPROVEMENT/VENTURE/PERSONAL/EDUCATION)",
+    "What is the loan grade? (A through G)",
+    "What is the requested loan amount in dollars?",
+    "What is the interest rate of the loan? (0-30%)",
+    "Has the applicant defaulted before? (Y/N)",
+    "What is the length of the applicant's credit history in years? (0-60 years)",
+]
+
+RESULT_BLOCK = """📊 Risk Assessment Results
+✅ Low Default Risk
+
+### **Personal Details:**
+- Age: 32 years
+- Income: $58,000
+- Home Ownership: RENT
+- Employment Length: 6 years
+
+### **Loan Details:**
+- Loan Amount: $12,000
+- Interest Rate: 11.5%
+- Loan Purpose: EDUCATION
+- Loan Grade: B
+
+### **Credit Details:**
+- Credit Default on File: No
+- Credit History Length: 8 years
+
+### **Key Factors:**
+- Loan grade (B) lowers the default risk (-0.85 log-odds)
+- Home ownership (RENT) raises the default risk (+0.62 log-odds)
+- Annual income (58000) lowers the default risk (-0.41 log-odds)
+"""
+
+FOLLOW_UP = ("Low default risk, approved automatically. The key factors are the model's own feature "
+             "contributions for this applicant. Would you like to start a new assessment? (yes/no)")
+
+
+def script():
+    # (user message, scripted assistant reply) for one full assessment
+    turns = [("yes", QUESTIONS[0])]
+    for value, question in zip(list(APPLICANT.values()), QUESTIONS[1:] + [None]):
+        reply = question or ("Please confirm: " + ", ".join(f"{k}={v}" for k, v in APPLICANT.items())
+                             + ". Is this correct?")
+        turns.append((str(value), reply))
+    turns.append(("yes, that is correct", {"tool_call": "loan_eligibility", "arguments": APPLICANT}))
+    return turns
+
+
+def run(compact, args):
+    messages = get_initial_messages()
+    collected = {}
+    sizes, latencies = [], []
+
+    for _ in range(args.assessments):
+        for user_text, reply in script():
+            messages.append({"role": "user", "content": user_text})
+            prompt = compact_messages(messages, collected) if compact else messages
+            client = ChatClient(FakeBackend([reply], args.first_token_ms / 1000, 0,
+                                            args.prompt_token_us / 1e6))
+            start = time.perf_counter()
+            chat_stream = client.complete("fake", prompt)
+            latencies.append(time.perf_counter() - start)
+            sizes.append(prompt_tokens(prompt))
+
+            if chat_stream.tool_calls:
+                # The result and its key factors are rendered locally, no LLM call
+                messages.append({"role": "assistant", "content": RESULT_BLOCK})
+                messages.append({"role": "assistant", "content": FOLLOW_UP})
+            else:
+                messages.append({"role": "assistant", "content": chat_stream.content})
+    return sizes, latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assessments", type=int, default=2, help="back-to-back intakes per session")
+    parser.add_argument("--first-token-ms", type=float, default=50, help="fixed fake LLM latency")
+    parser.add_argument("--prompt-token-us", type=float, default=100, help="fake prefill cost per prompt token")
+    args = parser.parse_args(argv)
+
+    results = {mode: run(mode == "compact", args) for mode in ("full", "compact")}
+    full_sizes, _ = results["full"]
+    compact_sizes, _ = results["compact"]
+
+    print(f"{'call':>4} {'full tokens':>12} {'compact tokens':>15}")
+    for i, (full, compact) in enumerate(zip(full_sizes, compact_sizes), 1):
+        print(f"{i:>4} {full:>12} {compact:>15}")
+    for mode, (sizes, latencies) in results.items():
+        print(f"{mode:>8}: {sum(sizes):>6} prompt tokens in total, max {max(sizes)}, "
+              f"{sum(latencies) * 1000:.0f} ms end to end over {len(latencies)} calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Fast scorer against the pickled pipeline: parity on a fixed sample, then latency.
+
+Exports the pipeline to a throwaway artifact, checks that FastScorer's
+default probabilities match the pipeline's within --tolerance on a seeded
+sample of credit_risk_dataset.csv (rows with missing values included) and
+fails if they don't. Then times both on batches of 1, 16, 256 and 4096
+applicants. The fast scorer skips pandas and sklearn's per-call overhead, so
+it wins on single requests and small batches; on large frames LightGBM's
+native predictor is faster.
+
+    python benchmarks/bench_fast_scorer.py --sample 2000 --sizes 1 16 256
+"""
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Application"))
+
+from fast_scorer import DEFAULT_DATASET_PATH, DEFAULT_MODEL_PATH, FEATURES, FastScorer, export  # noqa: E402
+
+
+def records(frame):
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient="records")
+
+
+def best_of(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sample", type=int, default=2000, help="rows in the parity sample")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="largest allowed probability difference")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 16, 256, 4096], help="batch sizes to time")
+    args = parser.parse_args(argv)
+
+    with open(DEFAULT_MODEL_PATH, "rb") as f:
+        pipeline = pickle.load(f)
+    with tempfile.TemporaryDirectory() as tmp:
+        scorer = FastScorer.load(export(pipeline, os.path.join(tmp, "Model_fast.npz")))
+
+    dataset = pd.read_csv(DEFAULT_DATASET_PATH)[FEATURES]
+    sample = dataset.sample(n=min(args.sample, len(dataset)), random_state=0)
+    positive = list(pipeline.classes_).index(1)
+    expected = pipeline.predict_proba(sample)[:, positive]
+    max_diff = float(np.max(np.abs(scorer.predict_proba(records(sample)) - expected)))
+    print(f"parity: {len(sample)} rows ({int(sample.isna().any(axis=1).sum())} with missing values), "
+          f"max probability difference {max_diff:.3e}")
+    if not max_diff <= args.tolerance:
+        sys.exit(f"fast scorer differs from the pipeline by {max_diff:.3e} > {args.tolerance:.0e}")
+
+    print(f"{'rows':>6} {'pipeline':>10} {'fast':>10}")
+    for size in args.sizes:
+        frame = dataset.sample(n=size, replace=True, random_state=1)
+        rows = records(frame)
+        # What a request pays: the pipeline needs a DataFrame built from the payload
+        repeats = max(5, min(200, 20_000 // size))
+        pipeline_s = best_of(lambda: pipeline.predict_proba(pd.DataFrame(rows, columns=FEATURES)), repeats)
+        fast_s = best_of(lambda: scorer.predict_proba(rows), repeats)
+        print(f"{size:>6} {pipeline_s * 1000:>8.2f}ms {fast_s * 1000:>8.2f}ms {pipeline_s / fast_s:6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Batch scoring throughput by process-pool size on a synthetic portfolio.
+
+Expands credit_risk_dataset.csv to --rows applicants by resampling rows,
+splits it into chunks and scores them with `batch_score` serially and with
+1, 2, 4, ... workers, checking every parallel run against the serial one.
+Pool timings include starting the workers and loading the model in each.
+A pool only pays off with spare cores: on a single core it is slower than
+scoring serially, so record results from the machine that will run it.
+
+    python benchmarks/bench_parallel_scoring.py --rows 1000000 --chunk-size 50000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Application"))
+
+from batch_score import score_chunks, score_chunks_parallel  # noqa: E402
+from dataset import load, widen  # noqa: E402
+from loan_schema import FIELD_ORDER  # noqa: E402
+from model_registry import DATASET_PATH, ensure_warm  # noqa: E402
+
+
+def synthetic_portfolio(rows, seed=0):
+    dataset = widen(load(DATASET_PATH, columns=FIELD_ORDER))
+    picks = np.random.default_rng(seed).integers(0, len(dataset), rows)
+    return dataset.iloc[picks].reset_index(drop=True)
+
+
+def default_worker_counts():
+    counts, n = [], 1
+    while n <= os.cpu_count():
+        counts.append(n)
+        n *= 2
+    if counts[-1] != os.cpu_count():
+        counts.append(os.cpu_count())
+    return counts
+
+
+def timed(results):
+    start = time.perf_counter()
+    probabilities = np.concatenate([scored["probability"].to_numpy() for scored in results])
+    return time.perf_counter() - start, probabilities
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic portfolio size")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="rows per task")
+    parser.add_argument("--workers", type=int, nargs="+", default=None,
+                        help="pool sizes to try (default: powers of two up to the core count)")
+    args = parser.parse_args(argv)
+
+    portfolio = synthetic_portfolio(args.rows)
+    chunks = [portfolio.iloc[i:i + args.chunk_size] for i in range(0, len(portfolio), args.chunk_size)]
+    loaded = ensure_warm()
+    print(f"{args.rows:,} rows in {len(chunks)} chunks, {os.cpu_count()} cores, model {loaded.version}")
+
+    serial_time, expected = timed(score_chunks(chunks, loaded.model))
+    print(f"{'serial':>8}: {serial_time:6.2f}s {args.rows / serial_time:>12,.0f} rows/s")
+    for workers in args.workers or default_worker_counts():
+        elapsed, probabilities = timed(score_chunks_parallel(chunks, loaded.version, workers=workers))
+        assert np.array_equal(probabilities, expected, equal_nan=True), "parallel scores differ from serial"
+        print(f"{workers:>8}: {elapsed:6.2f}s {args.rows / elapsed:>12,.0f} rows/s "
+              f"{serial_time / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+"""Benchmark suite for the scoring pipeline, the API and the chatbot loop.
+
+Measures, on applicants from credit_risk_dataset.csv:
+
+- scoring: single-row latency (plain and explained) and batch throughput
+  at 1, 100, 10k and 1M rows, the drift monitor's cost per applicant
+  and the cost of queueing a decision for the audit log
+- load: interpreter-to-first-prediction cold start, unpickle time and peak
+  memory, each in a fresh process (Linux)
+- flask: end-to-end /predict and /predict/batch latency through the Flask
+  test client
+- chatbot: a scripted intake against the local fake LLM, including the
+  tool call's scoring
+- startup: time to first paint of each Streamlit page and the number of
+  heavy libraries it loaded, each page cold in a fresh process
+- data: load time and in-memory size of the dataset, read_csv against
+  the typed columnar cache
+
+Results are written as JSON together with the library versions. With a
+baseline (by default benchmarks/baseline.json) every metric is compared and
+anything worse by more than --tolerance is flagged; the exit status is 1
+when there is a regression, so the suite can gate a dependency bump.
+Results carry a fingerprint of the machine (architecture, CPU model, core
+count, memory). Against a baseline from a different machine, regressions
+are printed with a warning but do not fail the run. Update the baseline
+only in a commit of its own, never alongside a code change.
+
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --suite scoring flask --sizes 1 100 10000
+    python benchmarks/bench_suite.py --save-baseline       # after an accepted change, on the reference machine
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..", "Application")
+sys.path.insert(0, APP_DIR)
+
+from dataset import load, widen  # noqa: E402
+from loan_schema import FIELD_ORDER, validate_frame  # noqa: E402
+from model_registry import DATASET_PATH, MODEL_PATH, current, ensure_warm  # noqa: E402
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+SUITES = ["scoring", "load", "flask", "chatbot", "startup", "data"]
+PAGES = ["home", "loan_core_ml", "loan_chatbot", "about_me"]
+DEFAULT_SIZES = [1, 100, 10_000, 1_000_000]
+
+# Runs in a fresh interpreter so imports and the unpickle start cold
+LOAD_SCRIPT = """
+import json, pickle, sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import pandas as pd
+import lightgbm, sklearn.compose, sklearn.pipeline
+from fast_imputer import serving_pipeline
+
+
+def memory_mb():
+    # (current, peak) resident memory. Linux only: ru_maxrss would carry the
+    # parent's peak over the exec
+    with open("/proc/self/status") as f:
+        status = dict(line.split(":", 1) for line in f)
+    return int(status["VmRSS"].split()[0]) / 1024, int(status["VmHWM"].split()[0]) / 1024
+
+
+imported = time.perf_counter()
+rss_before, _ = memory_mb()
+with open(sys.argv[2], "rb") as f:
+    model = pickle.load(f)
+unpickled = time.perf_counter()
+model = serving_pipeline(model)
+ready = time.perf_counter()
+model.predict_proba(pd.read_csv(sys.argv[3], nrows=2).iloc[[1]][list(model.feature_names_in_)])
+first = time.perf_counter()
+rss_after, peak = memory_mb()
+print(json.dumps({
+    "import_s": imported - start,
+    "unpickle_ms": (unpickled - imported) * 1000,
+    "serving_pipeline_ms": (ready - unpickled) * 1000,
+    "first_prediction_ms": (first - ready) * 1000,
+    "cold_start_s": first - start,
+    "peak_rss_mb": peak,
+    "model_rss_mb": rss_after - rss_before,
+}))
+"""
+
+# Opens one page of the Streamlit app cold, through its ?page= link
+STARTUP_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+sys.path.insert(0, sys.argv[1])
+from import_report import loaded_heavy_modules
+start = time.perf_counter()
+app = AppTest.from_file(sys.argv[2], default_timeout=120)
+app.query_params["page"] = sys.argv[3]
+app.run()
+painted = time.perf_counter()
+if app.exception:
+    sys.exit(f"{sys.argv[3]} failed: {app.exception[0].message}")
+print(json.dumps({"first_paint_ms": (painted - start) * 1000, "heavy_modules": loaded_heavy_modules()}))
+"""
+
+
+def metric(value, unit, better="lower"):
+    return {"value": float(value), "unit": unit, "better": better}
+
+
+def applicants():
+    dataset = widen(load(DATASET_PATH, columns=FIELD_ORDER))
+    return dataset.drop(index=list(validate_frame(dataset))).reset_index(drop=True)
+
+
+def resample(dataset, rows, seed=0):
+    picks = np.random.default_rng(seed).integers(0, len(dataset), rows)
+    return dataset.iloc[picks].reset_index(drop=True)
+
+
+def latencies(fn, calls, warmup=20):
+    for i in range(warmup):
+        fn(i)
+    times = []
+    for i in range(calls):
+        start = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+def percentiles(prefix, ms):
+    return {
+        f"{prefix}_p50_ms": metric(np.percentile(ms, 50), "ms"),
+        f"{prefix}_p99_ms": metric(np.percentile(ms, 99), "ms"),
+    }
+
+
+def bench_scoring(dataset, args):
+    from explain import predict_explained_versioned
+
+    model = ensure_warm().model
+    rows = [dataset.iloc[[i % len(dataset)]] for i in range(args.calls)]
+    results = {}
+    results.update(percentiles("single_row", latencies(lambda i: model.predict_proba(rows[i]), args.calls)))
+    results.update(percentiles("single_row_explained",
+                               latencies(lambda i: predict_explained_versioned(rows[i]), args.calls)))
+
+    for size in args.sizes:
+        frame = resample(dataset, size)
+        model.predict_proba(frame.iloc[:100])
+        # Best of a few runs; large batches get fewer repeats
+        repeats = max(1, min(200, 200_000 // size))
+        best = min(timed(lambda: model.predict_proba(frame)) for _ in range(repeats))
+        results[f"batch_{size}_rows_per_s"] = metric(size / best, "rows/s", "higher")
+
+    from drift import DriftMonitor
+    monitor = DriftMonitor.load()
+    records = dataset.iloc[:1000].to_dict("records")
+    best = min(timed(lambda: [monitor.observe(row) for row in records]) for _ in range(5))
+    results["drift_observe_us"] = metric(best / len(records) * 1e6, "us")
+
+    # What a request pays to queue its decision; the disk write happens on the writer thread
+    from audit_log import AuditLog, entry
+    decision = {"policy": "default", "decision": "auto_approve", "risk_grade": "R1"}
+    with tempfile.TemporaryDirectory() as tmp:
+        log = AuditLog(os.path.join(tmp, "decisions.db"), queue_size=len(records) * 5 + 1)
+        best = min(timed(lambda: [log.record([entry("bench", "bench", "bench", 0.1, decision, row)])
+                                  for row in records]) for _ in range(5))
+        log.close()
+    results["audit_record_us"] = metric(best / len(records) * 1e6, "us")
+    return results
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench_load(args):
+    if not os.path.exists("/proc/self/status"):
+        print("load benchmark needs /proc (Linux), skipped", file=sys.stderr)
+        return {}
+    runs = []
+    for _ in range(args.load_runs):
+        output = subprocess.run([sys.executable, "-c", LOAD_SCRIPT, APP_DIR, MODEL_PATH, DATASET_PATH],
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    units = {"import_s": "s", "cold_start_s": "s", "peak_rss_mb": "MB", "model_rss_mb": "MB"}
+    return {f"load_{name}": metric(np.median([run[name] for run in runs]), units.get(name, "ms"))
+            for name in runs[0]}
+
+
+def bench_startup(args):
+    results = {}
+    for page in PAGES:
+        runs = []
+        for _ in range(args.load_runs):
+            output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, APP_DIR,
+                                     os.path.join(APP_DIR, "app.py"), page],
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        results[f"startup_{page}_first_paint_ms"] = metric(np.median([run["first_paint_ms"] for run in runs]), "ms")
+        results[f"startup_{page}_heavy_modules"] = metric(len(runs[-1]["heavy_modules"]), "modules")
+    return results
+
+
+def bench_data(args):
+    import tempfile
+
+    from dataset import cached
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        convert_s = timed(lambda: cached(DATASET_PATH, cache_dir))
+        csv_s = min(timed(lambda: pd.read_csv(DATASET_PATH)) for _ in range(args.load_runs))
+        cache_s = min(timed(lambda: load(DATASET_PATH, cache_dir=cache_dir)) for _ in range(args.load_runs))
+        csv_mb = pd.read_csv(DATASET_PATH).memory_usage(deep=True).sum() / 1e6
+        cache_mb = load(DATASET_PATH, cache_dir=cache_dir).memory_usage(deep=True).sum() / 1e6
+    return {
+        "data_convert_ms": metric(convert_s * 1000, "ms"),
+        "data_read_csv_ms": metric(csv_s * 1000, "ms"),
+        "data_cache_load_ms": metric(cache_s * 1000, "ms"),
+        "data_read_csv_mb": metric(csv_mb, "MB"),
+        "data_cache_mb": metric(cache_mb, "MB"),
+    }
+
+
+def bench_flask(dataset, args):
+    import importlib.util
+    from audit_log import audit
+    from score_cache import cache
+
+    spec = importlib.util.spec_from_file_location("flask_api", os.path.join(APP_DIR, "flask", "flask_api.py"))
+    flask_api = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(flask_api)
+    client = flask_api.app.test_client()
+    rows = json.loads(dataset.iloc[:args.calls].to_json(orient="records"))
+    batch = json.loads(resample(dataset, 100).to_json(orient="records"))
+
+    def predict(i):
+        # Distinct applicants with an empty cache, so every call reaches the model
+        cache.clear()
+        assert client.post("/predict", json=rows[i % len(rows)]).status_code == 200
+
+    def predict_batch(i):
+        assert client.post("/predict/batch", json=batch).status_code == 200
+
+    # Synthetic decisions go to a throwaway audit database, never the real one.
+    # Drift counts stay in this process: no metrics directory is configured.
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        audit.close()
+        path, audit.path = audit.path, os.path.join(tmp, "decisions.db")
+        try:
+            results.update(percentiles("flask_predict", latencies(predict, args.calls)))
+            results.update(percentiles("flask_batch_100", latencies(predict_batch, max(20, args.calls // 10))))
+        finally:
+            audit.close()
+            audit.path = path
+    return results
+
+
+def bench_chatbot(args):
+    from chat_context import compact_messages
+    from chatbot_prompt import get_initial_messages
+    from explain import predict_explained_versioned, summarize
+    from llm_client import ChatClient, FakeBackend
+    from risk_policy import current_policy
+
+    from bench_chat_context import script
+
+    ensure_warm()
+
+    def intake(_):
+        # One full assessment: every turn through the compacted context and the
+        # fake LLM, then the tool call scored the way the chatbot does
+        turns = script()
+        client = ChatClient(FakeBackend([reply for _, reply in turns], 0, 0))
+        messages = get_initial_messages()
+        collected = {}
+        for user_text, _ in turns:
+            messages.append({"role": "user", "content": user_text})
+            chat_stream = client.complete("fake", compact_messages(messages, collected))
+            if chat_stream.tool_calls:
+                applicant = json.loads(chat_stream.tool_calls[0]["arguments"])
+                [((probability, contributions), _)] = predict_explained_versioned(pd.DataFrame([applicant]))
+                current_policy().decide(probability, applicant["loan_intent"])
+                messages.append({"role": "assistant", "content": summarize(contributions, applicant)})
+            else:
+                messages.append({"role": "assistant", "content": chat_stream.content})
+
+    return percentiles("chatbot_intake", latencies(intake, max(10, args.calls // 20), warmup=3))
+
+
+def machine():
+    # What the timings depend on, as opposed to the library versions being checked
+    cpu = platform.processor() or None
+    memory_gb = None
+    if os.path.exists("/proc/cpuinfo"):
+        with open("/proc/cpuinfo") as f:
+            cpu = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), cpu)
+    if os.path.exists("/proc/meminfo"):
+        with open("/proc/meminfo") as f:
+            total_kb = next((int(line.split()[1]) for line in f if line.startswith("MemTotal")), None)
+        memory_gb = round(total_kb / 1024 ** 2) if total_kb else None
+    return {"arch": platform.machine(), "cpu": cpu, "cpu_count": os.cpu_count(), "memory_gb": memory_gb}
+
+
+def machine_mismatch(env):
+    """Fingerprint fields where a baseline's machine differs from this one; None when it has none."""
+    if "machine" not in env:
+        return None
+    here = machine()
+    return {key: (env["machine"].get(key), value) for key, value in here.items()
+            if env["machine"].get(key) != value}
+
+
+def environment():
+    import lightgbm
+    import sklearn
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "machine": machine(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scikit-learn": sklearn.__version__,
+        "lightgbm": lightgbm.__version__,
+        "model_version": current().version,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Rows of (name, baseline, current, change, regressed) for metrics present in both."""
+    rows = []
+    for name, current_metric in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if base["value"]:
+            change = current_metric["value"] / base["value"] - 1
+        else:
+            # Anything above a zero baseline (e.g. heavy modules on a page) counts as worse
+            change = float("inf") if current_metric["value"] > 0 else 0.0
+        worse = change if current_metric["better"] == "lower" else -change
+        rows.append((name, base["value"], current_metric["value"], change, worse > tolerance))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suite", nargs="+", choices=SUITES, default=SUITES, help="benchmarks to run")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="batch sizes in rows")
+    parser.add_argument("--calls", type=int, default=300, help="timed calls per latency benchmark")
+    parser.add_argument("--load-runs", type=int, default=3, help="fresh processes per load and startup measurement")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="flag metrics more than this fraction worse than the baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    args = parser.parse_args(argv)
+
+    dataset = applicants()
+    results = {}
+    for suite in args.suite:
+        start = time.perf_counter()
+        if suite == "scoring":
+            results.update(bench_scoring(dataset, args))
+        elif suite == "load":
+            results.update(bench_load(args))
+        elif suite == "flask":
+            results.update(bench_flask(dataset, args))
+        elif suite == "startup":
+            results.update(bench_startup(args))
+        elif suite == "data":
+            results.update(bench_data(args))
+        else:
+            results.update(bench_chatbot(args))
+        print(f"{suite} done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline["results"], args.tolerance)
+        env = baseline["environment"]
+        print(f"Baseline {env['commit']} ({env['timestamp']}), scikit-learn {env['scikit-learn']}, "
+              f"lightgbm {env['lightgbm']}; tolerance {args.tolerance:.0%}")
+        print(f"{'metric':<36} {'baseline':>14} {'current':>14} {'change':>8}")
+        for name, base, value, change, regressed in rows:
+            print(f"{name:<36} {base:>14,.3f} {value:>14,.3f} {change:>+8.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+        regressions = [row[0] for row in rows if row[4]]
+        mismatch = machine_mismatch(env)
+        if mismatch is None:
+            print("warning: the baseline has no machine fingerprint; re-save it on the reference machine",
+                  file=sys.stderr)
+        elif mismatch:
+            # Timings from other hardware say nothing about this change, so don't fail on them
+            differences = ", ".join(f"{key} {base!r} -> {value!r}" for key, (base, value) in mismatch.items())
+            print(f"warning: baseline recorded on a different machine ({differences}); "
+                  f"regressions are reported but do not fail the run", file=sys.stderr)
+            regressions = []
+    else:
+        for name, current_metric in results.items():
+            print(f"{name:<36} {current_metric['value']:>14,.3f} {current_metric['unit']}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
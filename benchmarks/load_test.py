@@ -0,0 +1,161 @@
+"""Closed-loop HTTP load test for the Flask API: p50/p99 latency and requests/second.
+
+Each of --concurrency clients sends applicants from credit_risk_dataset.csv
+(shuffled with a fixed seed) back to back over a keep-alive connection for
+--duration seconds, after a short warm-up. With --serve the harness starts
+the production server itself, waits for /readyz and stops it with SIGTERM
+afterwards, so a run is reproducible from a clean checkout:
+
+    python benchmarks/load_test.py --serve --workers 4 --concurrency 32 --duration 20
+    python benchmarks/load_test.py --url http://localhost:8000 --endpoint batch --batch-size 100
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "Application"))
+
+from dataset import load, widen  # noqa: E402
+from loan_schema import FIELD_ORDER, validate_frame  # noqa: E402
+
+DATASET_PATH = os.path.join(ROOT, "Dataset", "credit_risk_dataset.csv")
+SERVE_PATH = os.path.join(ROOT, "Application", "flask", "serve.py")
+
+
+def applicants(seed):
+    dataset = widen(load(DATASET_PATH, columns=FIELD_ORDER))
+    dataset = dataset.drop(index=list(validate_frame(dataset)))
+    dataset = dataset.sample(frac=1, random_state=seed)
+    return json.loads(dataset.to_json(orient="records"))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args):
+    port = free_port()
+    command = [sys.executable, SERVE_PATH, "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers),
+               "--threads", str(args.threads)]
+    server = subprocess.Popen(command, cwd=os.path.join(ROOT, "Application"))
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/readyz", timeout=1).status_code == 200:
+                return server, url
+        except httpx.TransportError:
+            pass
+        if server.poll() is not None:
+            sys.exit("Server exited during startup")
+        time.sleep(0.2)
+    server.terminate()
+    sys.exit("Server did not become ready within 120s")
+
+
+def client(url, payloads, offset, stop_at, warm_until, latencies, errors):
+    with httpx.Client(base_url=url, timeout=30) as http:
+        i = offset
+        while True:
+            start = time.perf_counter()
+            if start >= stop_at:
+                return
+            try:
+                path, body = payloads[i % len(payloads)]
+                ok = http.post(path, json=body).status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            end = time.perf_counter()
+            if end >= warm_until:
+                latencies.append(end - start)
+                if not ok:
+                    errors.append(1)
+            i += 1
+
+
+def run(url, args):
+    rows = applicants(args.seed)
+    if args.endpoint == "predict":
+        payloads = [("/predict", row) for row in rows]
+    else:
+        payloads = [("/predict/batch", rows[i:i + args.batch_size])
+                    for i in range(0, len(rows), args.batch_size)]
+
+    latencies, errors = [], []
+    start = time.perf_counter()
+    warm_until = start + args.warmup
+    stop_at = warm_until + args.duration
+    step = len(payloads) // args.concurrency or 1
+    threads = [threading.Thread(target=client,
+                                args=(url, payloads, n * step, stop_at, warm_until, latencies, errors))
+               for n in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ms = np.array(latencies) * 1000
+    rows_per_request = 1 if args.endpoint == "predict" else args.batch_size
+    return {
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_second": len(latencies) / args.duration,
+        "rows_per_second": len(latencies) * rows_per_request / args.duration,
+        "p50_ms": float(np.percentile(ms, 50)) if len(ms) else None,
+        "p90_ms": float(np.percentile(ms, 90)) if len(ms) else None,
+        "p99_ms": float(np.percentile(ms, 99)) if len(ms) else None,
+        "max_ms": float(ms.max()) if len(ms) else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server to test (ignored with --serve)")
+    parser.add_argument("--serve", action="store_true", help="start serve.py on a free port for the run")
+    parser.add_argument("--workers", type=int, default=2, help="server workers with --serve")
+    parser.add_argument("--threads", type=int, default=8, help="threads per server worker with --serve")
+    parser.add_argument("--endpoint", choices=["predict", "batch"], default="predict")
+    parser.add_argument("--batch-size", type=int, default=100, help="applicants per /predict/batch request")
+    parser.add_argument("--concurrency", type=int, default=16, help="simultaneous clients")
+    parser.add_argument("--duration", type=float, default=10, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="unmeasured seconds before the run")
+    parser.add_argument("--seed", type=int, default=0, help="payload order")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if args.serve:
+        server, url = start_server(args)
+    try:
+        result = run(url, args)
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['endpoint']}: {result['requests']:,} requests, {result['errors']} errors, "
+              f"{result['requests_per_second']:,.0f} req/s ({result['rows_per_second']:,.0f} rows/s) | "
+              f"p50 {result['p50_ms']:.1f} ms, p90 {result['p90_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+    return result
+
+
+if __name__ == "__main__":
+    main()